@@ -1,10 +1,16 @@
 '''
 Analytically pricing European options under the Black-Scholes-Merton model, with
 Greeks.
+
+The pricer is vectorized: all inputs broadcast against each other, so a whole
+book of contracts is priced in one pass. Intermediates (discount factors,
+d1/d2, pdf/cdf values) are shared between V0 and the Greeks, and are computed
+in place in caller-provided buffers if given, so hot loops don't allocate.
 '''
 
 import numpy as np
-from scipy.stats import norm as normal
+from scipy.special import ndtr
+from time import perf_counter
 
 # model params
 T = 3 # duration
@@ -15,36 +21,65 @@ S0 = 90 # initial spot price
 # option params
 K = 100 # strike price
 style = 'call' # call or put
+# book params
+N_book = 200000 # number of contracts in the test book
 
 assert style in ('call', 'put')
-Phi = normal.cdf
-phi = normal.pdf
-
-def price(S0, sig, T, style):
-  d1 = (np.log(S0/K)+(r-q+sig**2/2)*T)/(sig*T**.5)
-  d2 = d1-sig*T**.5
-  Gamma = np.exp(-q*T)*phi(d1)/(S0*sig*T**.5)
-  Vega = S0*np.exp(-q*T)*T**.5*phi(d1)
-  match style:
-    case 'call':
-      V0 = S0*np.exp(-q*T)*Phi(d1)-K*np.exp(-r*T)*Phi(d2)
-      Delta = np.exp(-q*T)*Phi(d1)
-      Theta = -(S0*sig*np.exp(-q*T))/(2*T**.5)*phi(d1)-r*K*np.exp(-r*T)*Phi(d2)+q*S0*np.exp(-q*T)*Phi(d1)
-    case 'put':
-      V0 = -S0*np.exp(-q*T)*Phi(-d1)+K*np.exp(-r*T)*Phi(-d2)
-      Delta = -np.exp(-q*T)*Phi(-d1)
-      Theta = -(S0*sig*np.exp(-q*T))/(2*T**.5)*phi(d1)+r*K*np.exp(-r*T)*Phi(-d2)-q*S0*np.exp(-q*T)*Phi(-d1)
-  return V0, Delta, Gamma, Vega, Theta
-
-V0, Delta, Gamma, Vega, Theta = price(S0, sig, T, style)
+
+def price(S0, K, T, r, q, sig, call, out=None, tmp=None):
+# call is a boolean mask, True for calls and False for puts.
+# out (5, ...) receives V0, Delta, Gamma, Vega, Theta, tmp (4, ...) is scratch.
+  shape = np.broadcast_shapes(*map(np.shape, (S0, K, T, r, q, sig, call)))
+  if out is None: out = np.empty((5, *shape))
+  if tmp is None: tmp = np.empty((4, *shape))
+# Indexing with ... keeps 0-d views for scalar inputs.
+  V0, Delta, Gamma, Vega, Theta = (out[i,...] for i in range(5))
+  sT, d1, d2, sgn = (tmp[i,...] for i in range(4))
+# sgn = +1 for calls, -1 for puts, sT = sig*sqrt(T).
+  np.multiply(call, 2., out=sgn); sgn -= 1
+  np.sqrt(T, out=sT); sT *= sig
+# d1 and d2.
+  np.divide(S0, K, out=d1); np.log(d1, out=d1)
+  np.multiply(sig, sig, out=d2); d2 *= .5; d2 += r; d2 -= q; d2 *= T
+  d1 += d2; d1 /= sT
+  np.subtract(d1, sT, out=d2)
+# Gamma holds the pdf, Delta exp(-qT), Theta exp(-rT) for now.
+  np.multiply(d1, d1, out=Gamma); Gamma *= -.5; np.exp(Gamma, out=Gamma)
+  Gamma *= (2*np.pi)**-.5
+  np.multiply(q, T, out=Delta); Delta *= -1; np.exp(Delta, out=Delta)
+  np.multiply(r, T, out=Theta); Theta *= -1; np.exp(Theta, out=Theta)
+# d1 and d2 become Phi(sgn*d1) and Phi(sgn*d2).
+  d1 *= sgn; ndtr(d1, out=d1)
+  d2 *= sgn; ndtr(d2, out=d2)
+# Vega holds S0*exp(-qT), V0 K*exp(-rT)*Phi(sgn*d2), Theta the r term.
+  np.multiply(S0, Delta, out=Vega)
+  np.multiply(K, Theta, out=V0); V0 *= d2
+  np.multiply(r, V0, out=Theta)
+  Delta *= d1
+  np.multiply(S0, Delta, out=d2)
+  np.subtract(d2, V0, out=V0); V0 *= sgn
+  np.multiply(q, d2, out=d2); d2 -= Theta; d2 *= sgn
+  Delta *= sgn
+# Theta = -S0 exp(-qT) sig phi/(2 sqrt(T))+sgn*(qS0 exp(-qT) Phi(sgn*d1)-rK exp(-rT) Phi(sgn*d2))
+  Vega *= Gamma
+  np.multiply(Vega, sig, out=Theta); Theta *= sig; Theta /= sT; Theta *= -.5
+  Theta += d2
+# Gamma = exp(-qT) phi/(S0 sig sqrt(T)), Vega = S0 exp(-qT) sqrt(T) phi.
+  np.multiply(S0, sT, out=d1)
+  np.divide(Vega, d1, out=Gamma); Gamma /= S0
+  Vega *= sT; Vega /= sig
+  return out
+
+call = style == 'call'
+V0, Delta, Gamma, Vega, Theta = price(S0, K, T, r, q, sig, call)
 
 h = 1e-3
-x = lambda h: price(S0+h, sig, T, style)[0]
+x = lambda h: price(S0+h, K, T, r, q, sig, call)[0]
 Delta2 = (x(h)-x(-h))/(2*h)
 Gamma2 = (x(h)-2*x(0)+x(-h))/h**2
-x = lambda h: price(S0, sig+h, T, style)[0]
+x = lambda h: price(S0, K, T, r, q, sig+h, call)[0]
 Vega2 = (x(h)-x(-h))/(2*h)
-x = lambda h: price(S0, sig, T+h, style)[0]
+x = lambda h: price(S0, K, T+h, r, q, sig, call)[0]
 Theta2 = -(x(h)-x(-h))/(2*h)
 
 print(f'V0     {V0:.4e}')
@@ -52,3 +87,20 @@ print(f'Delta {Delta:+.4e} {Delta2:+.4e}')
 print(f'Gamma {Gamma:+.4e} {Gamma2:+.4e}')
 print(f'Vega  {Vega:+.4e} {Vega:+.4e}')
 print(f'Theta {Theta:+.4e} {Theta2:+.4e}')
+
+# A random book, priced twice into the same buffers to show the allocation-free
+# path.
+rng = np.random.default_rng(0)
+S0s = rng.uniform(50, 150, N_book)
+Ks = rng.uniform(50, 150, N_book)
+Ts = rng.uniform(.1, 5, N_book)
+rs = rng.uniform(0, .08, N_book)
+qs = rng.uniform(0, .04, N_book)
+sigs = rng.uniform(.05, .8, N_book)
+calls = rng.uniform(size=N_book) < .5
+out, tmp = np.empty((5, N_book)), np.empty((4, N_book))
+price(S0s, Ks, Ts, rs, qs, sigs, calls, out, tmp)
+t0 = perf_counter()
+price(S0s, Ks, Ts, rs, qs, sigs, calls, out, tmp)
+t1 = perf_counter()
+print(f'book of {N_book} priced in {t1-t0:.2e} s')
@@ -1,13 +1,18 @@
 '''
-Calculate implied volatility from a European option.
+Calculate implied volatility from European options.
+
+The solver works on whole option chains at once: a Corrado-Miller rational
+approximation gives the initial guess, followed by a few vectorized Halley
+steps. Each element keeps a bracket on the volatility, and falls back to
+bisection whenever a step leaves it or vega is too small to trust.
 '''
 
 import numpy as np
 from scipy.stats import norm as normal
-from scipy.optimize import root_scalar
 import matplotlib.pyplot as plt
 from pathlib import Path
 from os import makedirs
+from time import perf_counter
 
 makedirs(Path.cwd().parent/'out', exist_ok=True)
 plt.rcParams['font.size'] = 14
@@ -16,36 +21,98 @@ plt.rcParams['text.usetex'] = True
 
 # plot params
 plot_save = False
+# numerical params
+tol = 1e-10 # price tolerance
+n_iter_max = 30 # maximum number of iterations
 # model params
 T = 3 # duration
 r = 0.06 # risk free interest rate
 q = 0.02 # dividend rate
-sig0 = .2 # initial volatility estimate
 range_sig = (1e-2, 1.5) # range of volatilies to consider
 S0 = 100 # spot price
 # option params
 K = 70 # strike price
 V0 = 3.6691e+01 # option price
 style = 'call' # call or put
+# chain params
+N_chain = 5000 # number of strikes in the test chain
+range_K = (50, 200) # strike range of the test chain
 
 assert style in ('call', 'put')
-phi = normal.cdf
+Phi = normal.cdf
+phi = normal.pdf
 
-def price(S0, K, T, r, sig):
+def price(S0, K, T, r, q, sig, call):
   d1 = (np.log(S0/K)+(r-q+sig**2/2)*T)/(sig*T**.5)
   d2 = d1-sig*T**.5
-  match style:
-    case 'call': return S0*np.exp(-q*T)*phi(d1)-K*np.exp(-r*T)*phi(d2)
-    case 'put': return -S0*np.exp(-q*T)*phi(-d1)+K*np.exp(-r*T)*phi(-d2)
+  sgn = np.where(call, 1, -1)
+  return sgn*(S0*np.exp(-q*T)*Phi(sgn*d1)-K*np.exp(-r*T)*Phi(sgn*d2))
+
+def vol(V0, S0, K, T, r, q, call):
+# Returns the volatility, a convergence mask, a mask of prices within the
+# no-arbitrage bounds, and the number of iterations per element.
+  shape = np.broadcast_shapes(*map(np.shape, (V0, S0, K, T, r, q, call)))
+  V0, S0, K, T, r, q, call = map(np.ravel, np.broadcast_arrays(V0, S0, K, T, r, q, call))
+# Everything is solved in terms of the call price, via put-call parity.
+  Sq = S0*np.exp(-q*T)
+  Kr = K*np.exp(-r*T)
+  C = np.where(call, V0, V0+Sq-Kr)
+  in_bounds = (C > np.maximum(Sq-Kr, 0)) & (C < Sq)
+# Corrado-Miller initial guess, clipped to the bracket.
+  a = C-(Sq-Kr)/2
+  sig = (2*np.pi/T)**.5/(Sq+Kr)*(a+np.maximum(a**2-(Sq-Kr)**2/np.pi, 0)**.5)
+  lo = np.full(V0.size, range_sig[0])
+  hi = np.full(V0.size, range_sig[1])
+  sig = np.clip(np.nan_to_num(sig), .99*lo+.01*hi, .01*lo+.99*hi)
+  converged = np.zeros(V0.size, dtype=bool)
+  n_iter = np.zeros(V0.size, dtype=int)
+  i_active = np.nonzero(in_bounds)[0]
+  for _ in range(n_iter_max):
+    if i_active.size == 0: break
+    i = i_active
+    s, sT = sig[i], sig[i]*T[i]**.5
+    d1 = (np.log(Sq[i]/Kr[i])+sT**2/2)/sT
+    d2 = d1-sT
+    f = Sq[i]*Phi(d1)-Kr[i]*Phi(d2)-C[i]
+    vega = Sq[i]*phi(d1)*T[i]**.5
+    n_iter[i] += 1
+    done = np.abs(f) <= tol
+    converged[i[done]] = True
+# Price is increasing in vol, so the sign of f tightens the bracket.
+    lo[i] = np.where(f < 0, s, lo[i])
+    hi[i] = np.where(f > 0, s, hi[i])
+# Halley step, using vomma/vega = d1*d2/sig.
+    with np.errstate(divide='ignore', invalid='ignore'):
+      step = f/vega
+      step /= 1-.5*step*d1*d2/s
+      s_new = s-step
+    bad = ~((s_new > lo[i]) & (s_new < hi[i])) | (vega < tol)
+    s_new[bad] = .5*(lo[i][bad]+hi[i][bad])
+    sig[i] = np.where(done, s, s_new)
+# A collapsed bracket means the price can't be matched any better.
+    done |= hi[i]-lo[i] <= 1e-15*hi[i]
+    i_active = i[~done]
+  sig[~in_bounds] = np.nan
+  return tuple(x.reshape(shape) for x in (sig, converged, in_bounds, n_iter))
 
-def price_diff(sig, S0, K, T, r, V0):
-  return price(S0, K, T, r, sig)-V0
+sig, converged, in_bounds, n_iter = vol(V0, S0, K, T, r, q, style == 'call')
+assert in_bounds, 'option price outside of no-arbitrage bounds'
+print(f'vol {sig:.4e} ({n_iter} iterations{"" if converged else ", not converged"})')
 
-sig = root_scalar(price_diff, args=(S0, K, T, r, V0), bracket=range_sig, x0=sig0, method='bisect').root
-print(f'vol {sig:.4e}')
+# A test chain with a volatility smile, priced and inverted again.
+Ks = np.linspace(*range_K, N_chain)
+sigs_chain = .2+.3*np.log(Ks/S0)**2
+calls = Ks >= S0
+V0s_chain = price(S0, Ks, T, r, q, sigs_chain, calls)
+t0 = perf_counter()
+sigs_chain2, converged_chain, in_bounds_chain, n_iter_chain = vol(V0s_chain, S0, Ks, T, r, q, calls)
+t1 = perf_counter()
+print(f'chain of {N_chain} solved in {t1-t0:.2e} s')
+print(f'converged {np.sum(converged_chain)}/{N_chain}, max iterations {np.max(n_iter_chain)}')
+print(f'max vol error {np.max(np.abs(sigs_chain2-sigs_chain)[converged_chain]):.2e}')
 
 sigs = np.linspace(*range_sig, 128)
-V0s = [price(S0, K, T, r, sig) for sig in sigs]
+V0s = price(S0, K, T, r, q, sigs, style == 'call')
 plt.plot(sigs, V0s, c='black')
 plt.plot([sigs[0], sigs[-1]], [V0, V0], c='red')
 plt.plot([sig, sig], [V0s[0], V0s[-1]], c='red')
@@ -0,0 +1,96 @@
+'''
+Binomial tree pricing of American and European options under the
+Black-Scholes-Merton model, for a batch of contracts at once.
+
+The contracts share the duration, rates and volatility, but may differ in
+spot, strike, style and exercise. Their trees are carried side by side, as the
+columns of a (nodes, contracts) array, through a single backward induction.
+Each layer's spots follow from the previous layer's by one multiplication, and
+all updates are in place in preallocated buffers.
+
+Three trees are available. Cox-Ross-Rubinstein (CRR), whose error oscillates as
+O(1/N). Leisen-Reimer (LR), which centers the tree on the strike with
+Peizer-Pratt inversion, converging smoothly and as O(1/N^2) for European
+options. And the binomial Black-Scholes tree (BBS), CRR with the last step
+replaced by the analytical price, which converges smoothly as O(1/N), so that
+Richardson extrapolation (BBSR) applies.
+
+Not a script itself; imported by the binomial tree pricers.
+'''
+
+import numpy as np
+from scipy.special import ndtr
+
+def h(z, n):
+# Peizer-Pratt inversion (method 2) of the binomial distribution.
+  return .5+np.sign(z)*(.25-.25*np.exp(-(z/(n+1/3+.1/(n+1)))**2*(n+1/6)))**.5
+
+def BSM(S, K, T, r, q, sig, sgn):
+# Analytical price, sgn = +1 for calls and -1 for puts.
+  d1 = (np.log(S/K)+(r-q+sig**2/2)*T)/(sig*T**.5)
+  d2 = d1-sig*T**.5
+  return sgn*(S*np.exp(-q*T)*ndtr(sgn*d1)-K*np.exp(-r*T)*ndtr(sgn*d2))
+
+def price(S0, K, T, r, q, sig, call, american, N_bt, tree='CRR'):
+# call and american are boolean masks. S0, K, call and american broadcast
+# against each other, giving the shape of the result. LR needs an odd N_bt.
+  assert tree in ('CRR', 'LR', 'BBS')
+  shape = np.broadcast_shapes(*map(np.shape, (S0, K, call, american)))
+  S0, K, call, american = (np.broadcast_to(x, shape).ravel() for x in (S0, K, call, american))
+  dt = T/N_bt
+# The payoff is max(0, sgn*(S-K)). For the exercise values the spots and
+# strikes are stored premultiplied by ex, sgn for American contracts and 0 for
+# European ones.
+  sgn = 2.*call-1
+  ex = sgn*american
+  K_ex = ex*K
+# Up and down factors and probabilities, per contract for LR.
+  match tree:
+    case 'CRR' | 'BBS':
+      u = np.exp(sig*dt**.5)
+      d = 1/u
+      p = (np.exp((r-q)*dt)-d)/(u-d)
+    case 'LR':
+      assert N_bt%2 == 1
+      d1 = (np.log(S0/K)+(r-q+sig**2/2)*T)/(sig*T**.5)
+      p = h(d1-sig*T**.5, N_bt)
+      u = np.exp((r-q)*dt)*h(d1, N_bt)/p
+      d = (np.exp((r-q)*dt)-p*u)/(1-p)
+  a, b = np.exp(-r*dt)*p, np.exp(-r*dt)*(1-p)
+# Last layer, spots S0 d^n (u/d)^k for k = 0..n. For BBS it's the one before
+# expiry, valued analytically.
+  n = N_bt-1 if tree == 'BBS' else N_bt
+  S = np.empty((n+1, S0.size))
+  S[0] = S0*d**n
+  S[1:] = u/d
+  np.cumprod(S, axis=0, out=S)
+  if tree == 'BBS': V = np.maximum(BSM(S, K, dt, r, q, sig, sgn), ex*S-K_ex)
+  else:
+    V = S-K
+    V *= sgn
+    np.maximum(V, 0, out=V)
+  S *= ex
+  tmp = np.empty_like(V)
+  for i in range(n-1, -1, -1):
+  # Layer i has i+1 nodes, with spots 1/d times those of layer i+1.
+    V_, S_, tmp_ = V[:i+1], S[:i+1], tmp[:i+1]
+    np.multiply(V[1:i+2], a, out=tmp_)
+    V_ *= b
+    V_ += tmp_
+    S_ /= d
+    np.subtract(S_, K_ex, out=tmp_)
+    np.maximum(V_, tmp_, out=V_)
+  return V[0].reshape(shape)
+
+def extrapolate(S0, K, T, r, q, sig, call, american, N_bt, tree='BBS'):
+# Richardson extrapolation from N_bt and about N_bt/2 steps, assuming an error
+# of O(1/N), or O(1/N^2) for European options on LR trees. Returns the
+# extrapolated prices and the size of the correction, an estimate of the
+# error of the N_bt step prices and a conservative one of the extrapolation.
+  N_h = N_bt//2
+  if tree == 'LR': N_h |= 1
+  V, V_h = (price(S0, K, T, r, q, sig, call, american, N_, tree) for N_ in (N_bt, N_h))
+  k = 2 if tree == 'LR' else 1
+  k = np.where(american, 1, k)
+  dV = (V-V_h)/((N_bt/N_h)**k-1)
+  return V+dV, np.abs(dV)
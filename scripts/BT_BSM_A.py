@@ -1,9 +1,13 @@
 '''
 Binomial tree model for pricing American options under the Black-Scholes-Merton
 model.
+
+The tree is Cox-Ross-Rubinstein, Leisen-Reimer or binomial Black-Scholes, the
+latter two converging smoothly enough for Richardson extrapolation, which also
+gives an error estimate.
 '''
 
-import numpy as np
+from BT import price, extrapolate
 
 # model params
 T = 1 # duration
@@ -15,31 +19,16 @@ S0 = 90 # initial spot price
 K = 100 # strike price
 style = 'put'
 # numerical params
-N_bt = 4000 # binomial tree depth
+tree = 'BBS' # CRR, LR or BBS
+N_bt = 200 # binomial tree depth (odd for LR, CRR needs some 4000)
+richardson = True # Richardson extrapolation from N_bt and N_bt/2 (BBSR for BBS)
 
 assert style in ('call', 'put')
+assert tree in ('CRR', 'LR', 'BBS')
 
-# Tree parameters.
-dt = T/N_bt
-u = np.exp(sig*dt**.5)
-d = np.exp(-sig*dt**.5)
-p = (np.exp((r-q)*dt)-d)/(u-d)
-# Old and new tree layers.
-V0, V1 = np.zeros((2, N_bt+1))
-# Set up expiry bottom layer.
-n_up = np.arange(N_bt+1)
-S = S0*u**n_up*d**(N_bt-n_up)
-V1 = np.maximum(0, S-K if style == 'call' else K-S)
-# Construct higher layers iteratively.
-for i_layer in range(N_bt-1, -1, -1):
-# i_layer is both the index and length of the i-th layer, bottom is i=N_bt.
-  V0, V1 = V1, V0
-  n_up = np.arange(i_layer+1)
-  S = S0*u**n_up*d**(i_layer-n_up)
-# Attempt early exercise, otherwise hold.
-  V_hold = np.exp(-r*dt)*(p*V0[1:]+(1-p)*V0[:-1])
-  V_exer = np.maximum(0, S-K if style == 'call' else K-S)
-  V1 = np.maximum(V_hold, V_exer)
-V0 = V1[0]
-
-print(f'V0 {V0:.4e}')
+if richardson:
+  V0, err = extrapolate(S0, K, T, r, q, sig, style == 'call', True, N_bt, tree)
+  print(f'V0 {V0:.4e} (error estimate {err:.1e})')
+else:
+  V0 = price(S0, K, T, r, q, sig, style == 'call', True, N_bt, tree)
+  print(f'V0 {V0:.4e}')
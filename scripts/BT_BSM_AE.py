@@ -1,10 +1,12 @@
 '''
 Plot American vs European prices under the Black-Scholes-Merton method, the
-American option prices evaluated via a binomial tree model.
+American option prices evaluated via a binomial tree model, all spots in a
+single batched tree.
 '''
 
 import numpy as np
 from scipy.stats import norm as normal
+from BT import price
 import matplotlib.pyplot as plt
 from pathlib import Path
 from os import makedirs
@@ -33,24 +35,7 @@ assert style in ('call', 'put')
 Phi = normal.cdf
 
 def V0_A(style, S0, K, r, sig, T):
-  if isinstance(S0, np.ndarray) or isinstance(S0, list):
-    return [V0_A(style, S0_, K, r, sig, T) for S0_ in S0]
-  dt = T/N_bt
-  u = np.exp(sig*dt**.5)
-  d = np.exp(-sig*dt**.5)
-  p = (np.exp((r-q)*dt)-d)/(u-d)
-  V0, V1 = np.zeros((2, N_bt+1))
-  n_up = np.arange(N_bt+1)
-  S = S0*u**n_up*d**(N_bt-n_up)
-  V1 = np.maximum(0, S-K if style == 'call' else K-S)
-  for i_layer in range(N_bt-1, -1, -1):
-    V0, V1 = V1, V0
-    n_up = np.arange(i_layer+1)
-    S = S0*u**n_up*d**(i_layer-n_up)
-    V_hold = np.exp(-r*dt)*(p*V0[1:]+(1-p)*V0[:-1])
-    V_exer = np.maximum(0, S-K if style == 'call' else K-S)
-    V1 = np.maximum(V_hold, V_exer)
-  return V1[0]
+  return price(S0, K, T, r, q, sig, style == 'call', True, N_bt)
 
 def V0_E(style, S0, K, r, sig, T):
   d1 = (np.log(S0/K)+(r-q+sig**2/2)*T)/(sig*T**.5)
@@ -0,0 +1,187 @@
+'''
+Carr-Madan pricing of European options, numerically using the FFT, for the
+characteristic functions of the log spot price under various models.
+
+One FFT gives call prices on a whole log-strike grid, and several maturities
+are batched into a single 2-D FFT. Optionally the fractional FFT is used, which
+puts the log strikes on any given range, independently of the integration
+grid, so a few hundred points suffice for a realistic strike window, provided
+the characteristic function decays fast enough for the integral to be cut off
+at N eta (slowly decaying ones, such as short-dated variance gamma or bilateral
+gamma, need more points or a larger eta). The interpolants over the grid are
+cached per model, parameters and maturities, so later strike queries are
+lookups.
+
+Greeks are Carr-Madan integrals too, of the derivatives of the discounted
+characteristic function, which are the characteristic function times analytical
+derivatives of its log. They are stacked with the price along a leading axis,
+so the whole strike grid of every Greek comes from the same FFT batch.
+
+Not a script itself; imported by the Carr-Madan pricers.
+'''
+
+import numpy as np
+from scipy.interpolate import CubicSpline
+from functools import lru_cache
+
+# Characteristic functions of log(S_T), u and T broadcasting against each other.
+
+def cf_BSM(u, T, S0, r, q, sig):
+  phi0 = np.exp(1j*u*(np.log(S0)+(r-q-.5*sig**2)*T))
+  phiBS = np.exp(-.5*sig**2*T*u**2)
+  return phi0*phiBS
+
+def cf_VG(u, T, S0, r, q, nu, th, sig):
+  om = 1/nu*np.log(1-.5*sig**2*nu-th*nu)
+  phi0 = np.exp(1j*u*(np.log(S0)+(r-q+om)*T))
+  phiVG = (1-1j*u*th*nu+.5*sig**2*nu*u**2)**(-T/nu)
+  return phi0*phiVG
+
+def cf_BG(u, T, S0, r, q, al1, lam1, al2, lam2):
+  xi = -al1*np.log(lam1/(lam1-1))-al2*np.log(lam2/(lam2+1))
+  phi0 = np.exp(1j*u*(np.log(S0)+(r-q+xi)*T))
+  phiBG = (lam1/(lam1-1j*u))**(T*al1)*(lam2/(lam2+1j*u))**(T*al2)
+  return phi0*phiBG
+
+def cf_Heston(u, T, S0, r, q, eta, kap, th, rho, sig0):
+# The 'little Heston trap' form, which avoids the branch cut of the complex log.
+  d = ((rho*th*1j*u-kap)**2+th**2*(1j*u+u**2))**.5
+  g = (kap-rho*th*1j*u-d)/(kap-rho*th*1j*u+d)
+  C = kap*eta/th**2*((kap-rho*th*1j*u-d)*T-2*np.log((1-g*np.exp(-d*T))/(1-g)))
+  D = (kap-rho*th*1j*u-d)/th**2*(1-np.exp(-d*T))/(1-g*np.exp(-d*T))
+  return np.exp(1j*u*(np.log(S0)+(r-q)*T)+C+D*sig0**2)
+
+def cf_Merton(u, T, S0, r, q, sig, lam, mu_J, sig_J):
+  comp = np.exp(mu_J+sig_J**2/2)-1
+  phi0 = np.exp(1j*u*(np.log(S0)+(r-q-.5*sig**2-lam*comp)*T))
+  phiJ = np.exp(-.5*sig**2*T*u**2+lam*T*(np.exp(1j*u*mu_J-.5*sig_J**2*u**2)-1))
+  return phi0*phiJ
+
+def cf_Kou(u, T, S0, r, q, sig, lam, p, eta1, eta2):
+  comp = p*eta1/(eta1-1)+(1-p)*eta2/(eta2+1)-1
+  phi0 = np.exp(1j*u*(np.log(S0)+(r-q-.5*sig**2-lam*comp)*T))
+  phiJ = np.exp(-.5*sig**2*T*u**2+lam*T*(p*eta1/(eta1-1j*u)+(1-p)*eta2/(eta2+1j*u)-1))
+  return phi0*phiJ
+
+cfs = {'BSM': cf_BSM, 'VG': cf_VG, 'BG': cf_BG, 'Heston': cf_Heston,
+  'Merton': cf_Merton, 'Kou': cf_Kou}
+
+# Derivatives of the logs of the characteristic functions in T and in the model
+# params, those in S0 and r being the same for all models. The logs are on the
+# same branches as the powers in the characteristic functions.
+
+def dlcf_BSM(u, T, S0, r, q, sig):
+  dT = 1j*u*(r-q-.5*sig**2)-.5*sig**2*u**2
+  dsig = -1j*u*sig*T-sig*T*u**2
+  return dT, dsig
+
+def dlcf_VG(u, T, S0, r, q, nu, th, sig):
+  a = 1-.5*sig**2*nu-th*nu
+  om = 1/nu*np.log(a)
+  D = 1-1j*u*th*nu+.5*sig**2*nu*u**2
+  dT = 1j*u*(r-q+om)-np.log(D)/nu
+  dnu = 1j*u*T*(-om/nu-(.5*sig**2+th)/(nu*a))+T/nu**2*np.log(D)-T/nu*(-1j*u*th+.5*sig**2*u**2)/D
+  dth = -1j*u*T/a+1j*u*T/D
+  dsig = -1j*u*T*sig/a-T*sig*u**2/D
+  return dT, dnu, dth, dsig
+
+def dlcf_BG(u, T, S0, r, q, al1, lam1, al2, lam2):
+  xi = -al1*np.log(lam1/(lam1-1))-al2*np.log(lam2/(lam2+1))
+  l1, l2 = np.log(lam1/(lam1-1j*u)), np.log(lam2/(lam2+1j*u))
+  dT = 1j*u*(r-q+xi)+al1*l1+al2*l2
+  dal1 = -1j*u*T*np.log(lam1/(lam1-1))+T*l1
+  dlam1 = 1j*u*T*al1/(lam1*(lam1-1))+T*al1*(1/lam1-1/(lam1-1j*u))
+  dal2 = -1j*u*T*np.log(lam2/(lam2+1))+T*l2
+  dlam2 = -1j*u*T*al2/(lam2*(lam2+1))+T*al2*(1/lam2-1/(lam2+1j*u))
+  return dT, dal1, dlam1, dal2, dlam2
+
+# Per model, the derivative functions and the names of the model params.
+dlcfs = {'BSM': (dlcf_BSM, ('sig',)), 'VG': (dlcf_VG, ('nu', 'th', 'sig')),
+  'BG': (dlcf_BG, ('al1', 'lam1', 'al2', 'lam2'))}
+
+def frft(x, gam):
+# Fractional FFT sum_j x_j exp(-2 pi i j u gam) along the last axis, u < N,
+# as a convolution via FFTs of length 2N.
+  N = x.shape[-1]
+  j = np.arange(N)
+  w = np.exp(-1j*np.pi*gam*j**2)
+  y = np.concatenate([x*w, np.zeros_like(x)], axis=-1)
+  z = np.concatenate([1/w, [0], 1/w[:0:-1]])
+  return w*np.fft.ifft(np.fft.fft(y, axis=-1)*np.fft.fft(z), axis=-1)[...,:N]
+
+def calls(cf, T, r, N=4096, alp=1.5, eta=.25, range_k=None):
+# Call prices for maturities T (M,) on the log-strike grid k (N,), shape (M, N).
+# cf may stack several functions along leading axes, which are kept in front.
+# With range_k, the fractional FFT spreads k over range_k, otherwise the
+# spacing follows from eta.
+  T = np.asarray(T, dtype=float)[:,None]
+  if range_k is None:
+    lam = 2*np.pi/(N*eta)
+    b = lam*N/2
+  else:
+    lam = (range_k[1]-range_k[0])/(N-1)
+    b = -range_k[0]
+  k = -b+lam*np.arange(N)
+  v = eta*np.arange(N)
+  sw = (3+(-1)**np.arange(1, N+1))/3
+  sw[0] = 1/3
+  u = v-(alp+1)*1j
+  rho = np.exp(-r*T)*cf(u, T)/(alp**2+alp-v**2+1j*(2*alp+1)*v)
+  A = rho*np.exp(1j*v*b)*eta*sw
+  Z = (np.fft.fft(A, axis=-1) if range_k is None else frft(A, eta*lam/(2*np.pi))).real
+  return k, np.exp(-alp*k)*Z/np.pi
+
+@lru_cache(maxsize=256)
+def splines(model, params, Ts, N=4096, alp=1.5, eta=.25, range_k=None):
+# Interpolants of the call prices in log strike, one per maturity. params are
+# (S0, r, q, model params...).
+  k, Cs = calls(lambda u, T: cfs[model](u, T, *params), Ts, params[1], N, alp, eta, range_k)
+  return [CubicSpline(k, C) for C in Cs]
+
+def price(model, params, T, K, call, N=4096, alp=1.5, eta=.25, range_K=None):
+# European prices of strikes K at maturity T, or of shape (M, *K.shape) for
+# maturities T (M,). call is a boolean mask, puts follow from put-call parity.
+# With range_K, the fractional FFT is used over that strike range.
+  S0, r, q = params[:3]
+  Ts = np.atleast_1d(T).astype(float)
+  K = np.asarray(K, dtype=float)
+  range_k = None if range_K is None else tuple(np.log(range_K).tolist())
+  sps = splines(model, tuple(map(float, params)), tuple(Ts), N, alp, eta, range_k)
+  V0 = np.array([sp(np.log(K)) for sp in sps])
+  Ts = Ts.reshape(-1, *[1]*K.ndim)
+  V0 += np.where(call, 0, -S0*np.exp(-q*Ts)+np.exp(-r*Ts)*K)
+  return V0 if np.ndim(T) else V0[0]
+
+@lru_cache(maxsize=256)
+def greek_splines(model, params, Ts, N=4096, alp=1.5, eta=.25, range_k=None):
+# Interpolant in log strike of the call Greeks, shape (G, M) for maturities Ts
+# (M,): Delta, Gamma, Theta, Rho and the model param sensitivities. e^-rT is
+# applied by calls, so the r and T rows carry its derivative too.
+  S0, r = params[:2]
+  dlcf = dlcfs[model][0]
+  def cf(u, T):
+    phi = cfs[model](u, T, *params)
+    dT, *dps = dlcf(u, T, *params)
+    iu = 1j*u
+    return np.stack([iu/S0*phi, iu*(iu-1)/S0**2*phi, (r-dT)*phi, (iu-1)*T*phi,
+      *(dp*phi for dp in dps)])
+  k, Cs = calls(cf, Ts, r, N, alp, eta, range_k)
+  return CubicSpline(k, Cs, axis=-1)
+
+def greeks(model, params, T, K, call, N=4096, alp=1.5, eta=.25, range_K=None):
+# European Greeks of strikes K at maturity T, by name, each shaped like the
+# prices of price: Delta, Gamma, Theta (-dV/dT), Rho and one per model param
+# (named as in dlcfs). Those of puts follow from put-call parity.
+  S0, r, q = params[:3]
+  Ts = np.atleast_1d(T).astype(float)
+  K = np.asarray(K, dtype=float)
+  range_k = None if range_K is None else tuple(np.log(range_K).tolist())
+  sp = greek_splines(model, tuple(map(float, params)), tuple(Ts), N, alp, eta, range_k)
+  Gs = sp(np.log(K))
+  Ts = Ts.reshape(-1, *[1]*K.ndim)
+  put = ~np.asarray(call, dtype=bool)
+  Gs[0] -= put*np.exp(-q*Ts)
+  Gs[2] -= put*(q*S0*np.exp(-q*Ts)-r*K*np.exp(-r*Ts))
+  Gs[3] -= put*Ts*K*np.exp(-r*Ts)
+  names = ('Delta', 'Gamma', 'Theta', 'Rho', *dlcfs[model][1])
+  return {name: G if np.ndim(T) else G[0] for name, G in zip(names, Gs)}
@@ -1,15 +1,17 @@
 '''
 Bilateral gamma pricing of European options via the Carr-Madan formula,
-numerically using the FFT.
+numerically using the FFT, with Greeks from the same FFT batch.
 '''
 
-import numpy as np
-from scipy.interpolate import CubicSpline
+from CM import price, greeks
 
 # numerical params
-N = 4096 # resolution
+method = 'FFT' # FFT or FrFT (fractional FFT)
+N = 4096 # resolution (256-512 suffice for the FrFT only for fast decaying, e.g. long-dated, characteristic functions, eta being fixed)
+N_ref = 4096 # resolution of the FFT reference for the FrFT error
 alp = 1.5 # alpha, see Carr-Madan paper
 eta = .25 # eta, see Carr-Madan paper
+range_K = (50, 200) # strike range of the FrFT
 # model params
 T = 1 # duration
 r = .05 # risk free interest rate
@@ -24,23 +26,18 @@ K = 100 # strike price
 style = 'call' # call or put
 
 assert style in ('call', 'put')
+assert method in ('FFT', 'FrFT')
 
-lam = 2*np.pi/(N*eta)
-b = lam*N/2
-k = np.arange(-b, b, lam)
-v = np.arange(0, N*eta, eta)
-sw = (3+(-1)**np.arange(1, N+1))/3
-sw[0] = 1/3
-u = v-(alp+1)*1j
-xi = -al1*np.log(lam1/(lam1-1))-al2*np.log(lam2/(lam2+1))
-phi0 = np.exp(1j*u*(np.log(S0)+(r-q+xi)*T))
-phiBG = (lam1/(lam1-1j*u))**(T*al1)*(lam2/(lam2+1j*u))**(T*al2)
-phi = phi0*phiBG
-rho = np.exp(-r*T)*phi/(alp**2+alp-v**2+1j*(2*alp+1)*v)
-A = rho*np.exp(1j*v*b)*eta*sw
-Z = np.fft.fft(A).real
-Cs = np.exp(-alp*k)*Z/np.pi
-V0 = CubicSpline(np.exp(k), Cs)(K)
-if style == 'put': V0 += -S0*np.exp(-q*T)+np.exp(-r*T)*K
+V0 = price('BG', (S0, r, q, al1, lam1, al2, lam2), T, K, style == 'call', N, alp, eta,
+  range_K if method == 'FrFT' else None)
+Gs = greeks('BG', (S0, r, q, al1, lam1, al2, lam2), T, K, style == 'call', N, alp, eta,
+  range_K if method == 'FrFT' else None)
 
 print(f'V0 {V0:.4e}')
+if method == 'FrFT':
+  V0_ref = price('BG', (S0, r, q, al1, lam1, al2, lam2), T, K, style == 'call', N_ref, alp, eta)
+  print(f'FrFT error {abs(V0-V0_ref):.2e} against the {N_ref}-point FFT')
+for name in ('Delta', 'Gamma', 'Theta', 'Rho'):
+  print(f'{name} {Gs[name]:.4e}')
+for name in ('al1', 'lam1', 'al2', 'lam2'):
+  print(f'dV/d{name} {Gs[name]:.4e}')
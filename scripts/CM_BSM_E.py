@@ -1,15 +1,19 @@
 '''
 Black-Scholes-Merton pricing of European options via the Carr-Madan formula,
-numerically via the FFT.
+numerically via the FFT, with Greeks from the same FFT batch.
 '''
 
 import numpy as np
-from scipy.interpolate import CubicSpline
+from scipy.stats import norm as normal
+from time import perf_counter
+from CM import price, greeks
 
 # numerical params
-N = 4096 # resolution
+method = 'FFT' # FFT or FrFT (fractional FFT)
+N = 4096 # resolution (some 256-512 suffice for the FrFT)
 alp = 1.5 # alpha, see Carr-Madan paper
 eta = .25 # eta, see Carr-Madan paper
+range_K = (50, 200) # strike range of the FrFT
 # model params
 T = 3 # duration
 r = 0.05 # risk free interest rate
@@ -19,24 +23,47 @@ S0 = 100 # initial spot price
 # option params
 K = 70 # strike price
 style = 'call' # call or put
+# grid params
+Ks = np.linspace(50, 150, 101) # strikes of the test grid
+Ts = np.array([.5, 1, 2, 3]) # maturities of the test grid
+N_frft = 256 # resolution of the FrFT for the test grid
 
 assert style in ('call', 'put')
+assert method in ('FFT', 'FrFT')
 
-lam = 2*np.pi/(N*eta)
-b = lam*N/2
-k = np.arange(-b, b, lam)
-v = np.arange(0, N*eta, eta)
-sw = (3+(-1)**np.arange(1, N+1))/3
-sw[0] = 1/3
-u = v-(alp+1)*1j
-phi0 = np.exp(1j*u*(np.log(S0)+(r-q-.5*sig**2)*T))
-phiBS = np.exp(-.5*sig**2*T*u**2)
-phi = phi0*phiBS
-rho = np.exp(-r*T)*phi/(alp**2+alp-v**2+1j*(2*alp+1)*v)
-A = rho*np.exp(1j*v*b)*eta*sw
-Z = np.fft.fft(A).real
-Cs = np.exp(-alp*k)*Z/np.pi
-V0 = CubicSpline(np.exp(k), Cs)(K)
-if style == 'put': V0 += -S0*np.exp(-q*T)+np.exp(-r*T)*K
+V0 = price('BSM', (S0, r, q, sig), T, K, style == 'call', N, alp, eta,
+  range_K if method == 'FrFT' else None)
+Gs = greeks('BSM', (S0, r, q, sig), T, K, style == 'call', N, alp, eta,
+  range_K if method == 'FrFT' else None)
 
 print(f'V0 {V0:.4e}')
+for name in ('Delta', 'Gamma', 'Theta', 'Rho'):
+  print(f'{name} {Gs[name]:.4e}')
+print(f'Vega {Gs["sig"]:.4e}')
+
+# A strike and maturity grid from one batched FFT and FrFT, against the
+# analytical prices. Second queries reuse the cached interpolants.
+Ts_ = Ts[:,None]
+d1 = (np.log(S0/Ks)+(r-q+sig**2/2)*Ts_)/(sig*Ts_**.5)
+d2 = d1-sig*Ts_**.5
+V0s_ = S0*np.exp(-q*Ts_)*normal.cdf(d1)-Ks*np.exp(-r*Ts_)*normal.cdf(d2)
+for method_, N_, range_K_ in (('FFT', N, None), ('FrFT', N_frft, (Ks[0], Ks[-1]))):
+  t0 = perf_counter()
+  V0s = price('BSM', (S0, r, q, sig), Ts, Ks, True, N_, alp, eta, range_K_)
+  t1 = perf_counter()
+  V0s = price('BSM', (S0, r, q, sig), Ts, Ks, True, N_, alp, eta, range_K_)
+  t2 = perf_counter()
+  print(f'{method_} grid of {V0s.size} max error {np.max(np.abs(V0s-V0s_)):.2e}, '
+        f'in {t1-t0:.2e} s, cached in {t2-t1:.2e} s')
+
+# Greeks over the grid, against the analytical ones.
+Gs_ = {'Delta': np.exp(-q*Ts_)*normal.cdf(d1),
+  'Gamma': np.exp(-q*Ts_)*normal.pdf(d1)/(S0*sig*Ts_**.5),
+  'Theta': -S0*np.exp(-q*Ts_)*normal.pdf(d1)*sig/(2*Ts_**.5)
+    +q*S0*np.exp(-q*Ts_)*normal.cdf(d1)-r*Ks*np.exp(-r*Ts_)*normal.cdf(d2),
+  'Rho': Ks*Ts_*np.exp(-r*Ts_)*normal.cdf(d2),
+  'sig': S0*np.exp(-q*Ts_)*normal.pdf(d1)*Ts_**.5}
+for method_, N_, range_K_ in (('FFT', N, None), ('FrFT', N_frft, (Ks[0], Ks[-1]))):
+  Gs = greeks('BSM', (S0, r, q, sig), Ts, Ks, True, N_, alp, eta, range_K_)
+  print(f'{method_} grid Greeks max error '
+        f'{", ".join(f"{name} {np.max(np.abs(Gs[name]-G)):.2e}" for name, G in Gs_.items())}')
@@ -0,0 +1,50 @@
+'''
+Heston pricing of European options via the Carr-Madan formula, numerically
+using the FFT.
+
+The characteristic function is the 'little Heston trap' form, which is stable
+for long maturities. A whole strike grid is priced at once.
+'''
+
+import numpy as np
+from time import perf_counter
+from CM import price
+
+# numerical params
+method = 'FFT' # FFT or FrFT (fractional FFT)
+N = 4096 # resolution (256-512 suffice for the FrFT only for fast decaying, e.g. long-dated, characteristic functions, eta being fixed)
+N_ref = 4096 # resolution of the FFT reference for the FrFT error
+alp = 1.5 # alpha, see Carr-Madan paper
+eta = .25 # eta, see Carr-Madan paper
+range_K = (50, 200) # strike range of the FrFT
+# model params
+T = 1 # duration
+r = .05 # risk free interest rate
+q = .02 # dividend rate
+eta_v = .04 # level of mean reversion
+kap = 1 # spread of mean reversion
+th = .1 # vol-of-vol (vol-of-var)
+rho = -.3 # vol-stock correlation
+S0 = 120 # initial spot price
+sig0 = .2 # initial volatility
+# option params
+K = 100 # strike price
+style = 'call' # call or put
+N_K = 1000 # number of strikes of the test grid
+
+assert style in ('call', 'put')
+assert method in ('FFT', 'FrFT')
+
+Ks = np.linspace(*range_K, N_K)
+t0 = perf_counter()
+V0s = price('Heston', (S0, r, q, eta_v, kap, th, rho, sig0), T, Ks, style == 'call', N, alp, eta,
+  range_K if method == 'FrFT' else None)
+t1 = perf_counter()
+V0 = price('Heston', (S0, r, q, eta_v, kap, th, rho, sig0), T, K, style == 'call', N, alp, eta,
+  range_K if method == 'FrFT' else None)
+
+print(f'V0 {V0:.4e}')
+print(f'grid of {N_K} strikes priced in {t1-t0:.2e} s')
+if method == 'FrFT':
+  V0s_ref = price('Heston', (S0, r, q, eta_v, kap, th, rho, sig0), T, Ks, style == 'call', N_ref, alp, eta)
+  print(f'FrFT max error {np.max(np.abs(V0s-V0s_ref)):.2e} over the grid against the {N_ref}-point FFT')
@@ -1,15 +1,17 @@
 '''
 Variance-gamma pricing of European options via the Carr-Madan formula,
-numerically using the FFT.
+numerically using the FFT, with Greeks from the same FFT batch.
 '''
 
-import numpy as np
-from scipy import interpolate as intp
+from CM import price, greeks
 
 # numerical params
-N = 4096 # resolution
+method = 'FFT' # FFT or FrFT (fractional FFT)
+N = 4096 # resolution (256-512 suffice for the FrFT only for fast decaying, e.g. long-dated, characteristic functions, eta being fixed)
+N_ref = 4096 # resolution of the FFT reference for the FrFT error
 alp = 1.5 # alpha, see Carr-Madan paper
 eta = .25 # eta, see Carr-Madan paper
+range_K = (20, 200) # strike range of the FrFT
 # model params
 T = 3 # duration
 r = .06 # risk free interest rate
@@ -23,23 +25,18 @@ K = 40 # strike price
 style = 'call' # call or put
 
 assert style in ('call', 'put')
+assert method in ('FFT', 'FrFT')
 
-lam = 2*np.pi/(N*eta)
-b = lam*N/2
-k = np.arange(-b, b, lam)
-v = np.arange(0, N*eta, eta)
-sw = (3+(-1)**np.arange(1, N+1))/3
-sw[0] = 1/3
-u = v-(alp+1)*1j
-om = 1/nu*np.log(1-.5*sig**2*nu-th*nu)
-phi0 = np.exp(1j*u*(np.log(S0)+(r-q+om)*T))
-phiVG = (1-1j*u*th*nu+.5*sig**2*nu*u**2)**(-T/nu)
-phi = phi0*phiVG
-rho = np.exp(-r*T)*phi/(alp**2+alp-v**2+1j*(2*alp+1)*v)
-A = rho*np.exp(1j*v*b)*eta*sw
-Z = np.fft.fft(A).real
-Cs = np.exp(-alp*k)*Z/np.pi
-V0 = intp.CubicSpline(np.exp(k), Cs)(K)
-if style == 'put': V0 += -S0*np.exp(-q*T)+np.exp(-r*T)*K
+V0 = price('VG', (S0, r, q, nu, th, sig), T, K, style == 'call', N, alp, eta,
+  range_K if method == 'FrFT' else None)
+Gs = greeks('VG', (S0, r, q, nu, th, sig), T, K, style == 'call', N, alp, eta,
+  range_K if method == 'FrFT' else None)
 
 print(f'V0 {V0:.4e}')
+if method == 'FrFT':
+  V0_ref = price('VG', (S0, r, q, nu, th, sig), T, K, style == 'call', N_ref, alp, eta)
+  print(f'FrFT error {abs(V0-V0_ref):.2e} against the {N_ref}-point FFT')
+for name in ('Delta', 'Gamma', 'Theta', 'Rho'):
+  print(f'{name} {Gs[name]:.4e}')
+for name in ('nu', 'th', 'sig'):
+  print(f'dV/d{name} {Gs[name]:.4e}')
@@ -0,0 +1,54 @@
+'''
+COS pricing of European options under the Black-Scholes-Merton, variance gamma,
+bilateral gamma or Heston model, compared against Carr-Madan.
+'''
+
+import numpy as np
+from time import perf_counter
+import COS
+import CM
+
+# numerical params
+N = 128 # number of terms
+L = 12 # truncation range, in standard deviations of log(S_T)
+# model params
+model = 'Heston' # BSM, VG, BG or Heston
+T = 1 # duration
+r = .05 # risk free interest rate
+q = .02 # dividend yield
+S0 = 100 # initial spot price
+sig = .2 # volatility (BSM, VG)
+nu = .2 # jump (VG)
+th = .05 # drift (VG), vol-of-vol (Heston)
+al1 = 1.18 # alpha^+ (BG)
+lam1 = 10.57 # lambda^+ (BG)
+al2 = 1.44 # alpha^- (BG)
+lam2 = 5.57 # lambda^- (BG)
+eta = .04 # level of mean reversion (Heston)
+kap = 1 # spread of mean reversion (Heston)
+rho = -.3 # vol-stock correlation (Heston)
+sig0 = .2 # initial volatility (Heston)
+# option params
+K = 100 # strike price
+style = 'call' # call or put
+range_K = (50, 200) # strike range of the test chain
+N_K = 1000 # number of strikes of the test chain
+
+assert style in ('call', 'put')
+assert model in ('BSM', 'VG', 'BG', 'Heston')
+
+match model:
+  case 'BSM': params = (S0, r, q, sig)
+  case 'VG': params = (S0, r, q, nu, th, sig)
+  case 'BG': params = (S0, r, q, al1, lam1, al2, lam2)
+  case 'Heston': params = (S0, r, q, eta, kap, th, rho, sig0)
+
+V0 = COS.price(model, params, T, K, style == 'call', N, L)
+V0_CM = CM.price(model, params, T, K, style == 'call')
+print(f'V0 {V0:.8e} (Carr-Madan {V0_CM:.8e})')
+
+Ks = np.linspace(*range_K, N_K)
+t0 = perf_counter()
+V0s = COS.price(model, params, T, Ks, style == 'call', N, L)
+t1 = perf_counter()
+print(f'chain of {N_K} priced in {t1-t0:.2e} s')
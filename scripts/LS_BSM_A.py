@@ -1,20 +1,131 @@
 '''
 Longstaff-Schwartz algorithm for pricing American options under the
-Black-Scholes-Merton model.
+Black-Scholes-Merton model, or any of the other models with a path generator
+(Heston, variance gamma, bilateral gamma).
 
-(Not completed.)
+The exercise dates are the n steps of the paths. First the exercise policy is
+trained: continuation values are regressed, date by date going backward, on a
+basis (Laguerre polynomials or monomials) of the spot over the in-the-money
+training paths. Only these training paths are held in memory, and only at the
+exercise dates. Then the option is priced with that policy on fresh paths,
+chunk by chunk like the other Monte Carlo pricers, exercised runs being dropped
+from the simulation. Pricing out of sample like this gives a low biased
+estimate, the policy being suboptimal, rather than the high biased in-sample
+one.
+Under Heston the regression only sees the spot, not the variance.
 '''
 
 import numpy as np
+from numpy.polynomial.laguerre import lagvander
+from time import perf_counter
+from MC_acc import run
+import MC_paths as paths
 
+# numerical params
+N = int(1e6) # maximum number of pricing runs
+N_train = int(1e5) # number of training runs
+n = 50 # number of steps (exercise dates) per run
+N_chunk = int(1e5) # number of runs per chunk
+basis = 'Laguerre' # Laguerre or monomial
+d = 3 # basis polynomial degree
+se_abs = None # target absolute s.e., if any
+se_rel = None # target relative s.e., if any
+t_max = None # time budget in seconds, if any
+seed = None # RNG seed, None for fresh entropy
+workers = 1 # number of worker processes
 # model params
+model = 'BSM' # BSM, Heston, VG or BG
 T = 1 # duration
 r = .05 # risk free interest rate
 q = .02 # dividend rate
-sig = .2 # volatility
 S0 = 90 # initial spot price
+sig = .2 # volatility (BSM, VG)
+eta = .04 # level of mean reversion (Heston)
+kap = 1 # spread of mean reversion (Heston)
+th = .1 # vol-of-vol (Heston), drift (VG)
+rho = -.3 # vol-stock correlation (Heston)
+sig0 = .2 # initial volatility (Heston)
+nu = .2 # jump (VG)
+al1 = 1.18 # alpha^+ (BG)
+lam1 = 10.57 # lambda^+ (BG)
+al2 = 1.44 # alpha^- (BG)
+lam2 = 5.57 # lambda^- (BG)
 # option params
 K = 100 # strike price
-style = 'put'
+style = 'put' # call or put
 
 assert style in ('call', 'put')
+assert model in ('BSM', 'Heston', 'VG', 'BG')
+assert basis in ('Laguerre', 'monomial')
+
+dt = T/n
+
+def payoff(S):
+  return np.maximum(0, S-K if style == 'call' else K-S)
+
+def X(S):
+# Basis functions of the moneyness, shape (len(S), d+1).
+  x = S/K
+  match basis:
+    case 'Laguerre': return np.exp(-x/2)[:,None]*lagvander(x, d)
+    case 'monomial': return np.vander(x, d+1, increasing=True)
+
+def generate(rng, N):
+  match model:
+    case 'BSM': return paths.BSM(rng, N, n, T, S0, r, q, sig)
+    case 'Heston': return paths.Heston(rng, N, n, T, S0, r, q, eta, kap, th, rho, sig0)
+    case 'VG': return paths.VG(rng, N, n, T, S0, r, q, nu, th, sig)
+    case 'BG': return paths.BG(rng, N, n, T, S0, r, q, al1, lam1, al2, lam2)
+
+def train(rng):
+# Regression coefficients of the continuation value at each exercise date
+# before expiry, nan where too few runs are in the money to regress.
+  S = np.empty((n, N_train))
+  for i in range(0, N_train, N_chunk):
+    N_ = min(N_chunk, N_train-i)
+    for j, S_ in enumerate(generate(rng, N_)): S[j,i:i+N_] = S_
+# Y holds the cash flow of each run under the policy so far, discounted to
+# the current date.
+  Y = payoff(S[-1])
+  coefs = np.full((n-1, d+1), np.nan)
+  for j in range(n-2, -1, -1):
+    Y *= np.exp(-r*dt)
+    h = payoff(S[j])
+    itm = np.flatnonzero(h > 0)
+    if itm.size <= d+1: continue
+    X_ = X(S[j,itm])
+    coefs[j] = np.linalg.lstsq(X_, Y[itm], rcond=None)[0]
+    ex = itm[h[itm] >= X_@coefs[j]]
+    Y[ex] = h[ex]
+  return coefs
+
+def sample(rng, N):
+# Discounted cash flows under the trained policy.
+  gen = generate(rng, N)
+  V = np.zeros(N)
+  alive = np.arange(N)
+  S = next(gen)
+  for j in range(n-1):
+    h = payoff(S)
+    ex = h > 0
+    if np.isnan(coefs[j,0]): ex[:] = False
+    else: ex[ex] = h[ex] >= X(S[ex])@coefs[j]
+    V[alive[ex]] = h[ex]*np.exp(-r*(j+1)*dt)
+    alive = alive[~ex]
+    S = gen.send(~ex)
+  V[alive] = payoff(S)*np.exp(-r*T)
+  return V
+
+# Training and pricing use independent streams.
+seed_train, seed_price = np.random.SeedSequence(seed).spawn(2)
+t0 = perf_counter()
+coefs = train(np.random.default_rng(seed_train))
+t1 = perf_counter()
+acc = run(sample, N, N_chunk, se_abs, se_rel, t_max, seed_price.generate_state(4), workers)
+t2 = perf_counter()
+# Exercising immediately is an option too.
+V0, se_V0 = max(acc.mean, payoff(S0)), acc.se
+
+print(f'runs {acc.n} (training {N_train})')
+print(f'V0 {V0:.4e} (s.e. {se_V0:.4e})')
+print(f'trained in {t1-t0:.2e} s, priced in {t2-t1:.2e} s')
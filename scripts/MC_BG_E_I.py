@@ -1,13 +1,38 @@
 '''
 Bilateral gamma Monte Carlo simulation to price European options, with
 importance sampling.
+
+A sum of i.i.d. gamma increments is gamma itself, so the terminal value is
+sampled exactly from two gamma draws per run, unless full paths are asked for.
+The measure change (the lambdas of the two gamma processes) is either fixed,
+or tuned on a pilot run.
+
+Greeks come from the same runs. Delta and Rho are pathwise, and Gamma the
+central difference of the pathwise Delta with common random numbers. In place
+of a Vega, the lambda sensitivities are likelihood ratio estimators
+(differentiating the Radon-Nikodym derivative, under which the draws do not
+depend on the lambdas) plus the pathwise dependence of the martingale drift.
 '''
 
 import numpy as np
+from MC_acc import run
+from MC_IS import tune
+from MC_greeks import dpayoff, Gamma_bump
 
 # numerical params
-N = int(4e5) # number of runs
-n = 1000 # number of steps per run
+N = int(4e5) # maximum number of runs
+n = 1000 # number of steps per run, for full paths
+N_chunk = int(1e4) # number of runs per chunk (lower it for full paths)
+terminal = True # sample only the terminal value, exactly
+se_abs = None # target absolute s.e., if any
+se_rel = None # target relative s.e., if any
+t_max = None # time budget in seconds, if any
+seed = None # RNG seed, None for fresh entropy
+workers = 1 # number of worker processes
+adaptive = True # tune lam1_ and lam2_ on a pilot run, starting from the values below
+N_pilot = int(1e4) # number of pilot runs
+greeks = True # also estimate Delta, Gamma, Rho and the lambda sensitivities from the same runs
+h_Gamma = .02 # relative spot bump for Gamma
 # model params
 T = 1 # duration
 r = 0.05 # risk free interest rate
@@ -28,20 +53,40 @@ assert style in ('call', 'put')
 
 dt = T/n
 xi = -al1*np.log(lam1/(lam1-1))-al2*np.log(lam2/(lam2+1))
-V0s = []
-for i in range(N):
-  gam1 = np.random.gamma(dt*al1, 1/lam1_, n)
-  gam2 = np.random.gamma(dt*al2, 1/lam2_, n)
-  gam1T = np.sum(gam1)
-  gam2T = np.sum(gam2)
+dxi1 = al1/(lam1*(lam1-1))
+dxi2 = -al2/(lam2*(lam2+1))
+
+def sample_(rng, N, lam_, greeks=False):
+  lam1_, lam2_ = lam_
+  if terminal:
+    gam1T = rng.gamma(T*al1, 1/lam1_, N)
+    gam2T = rng.gamma(T*al2, 1/lam2_, N)
+  else:
+    gam1T = np.sum(rng.gamma(dt*al1, 1/lam1_, (N, n)), axis=-1)
+    gam2T = np.sum(rng.gamma(dt*al2, 1/lam2_, (N, n)), axis=-1)
   xT = gam1T-gam2T
   S = S0*np.exp((r-q+xi)*T+xT)
   RN = (lam1/lam1_)**(al1*T)*(lam2/lam2_)**(al2*T)\
     *np.exp(-(lam1-lam1_)*gam1T-(lam2-lam2_)*gam2T)
-  V0s += [RN*max(0, S-K if style == 'call' else K-S)]
-V0 = np.mean(V0s)*np.exp(-r*T)
-var_V0 = np.var(V0s)*np.exp(-2*r*T)
-se_V0 = (var_V0/N)**.5
+  V = RN*np.maximum(0, S-K if style == 'call' else K-S)*np.exp(-r*T)
+  if not greeks: return V
+  dV = RN*dpayoff(S, K, style, r, T)
+  return np.stack((V, dV*S/S0, RN*Gamma_bump(S, S0, K, r, T, h_Gamma),
+    V*(al1*T/lam1-gam1T)+dV*S*T*dxi1, V*(al2*T/lam2-gam2T)+dV*S*T*dxi2, dV*T*S-T*V), axis=-1)
+
+if adaptive:
+# The lambdas stay positive, keeping the gamma scales finite.
+  (lam1_, lam2_), factor = tune(sample_, (lam1_, lam2_), N_pilot, seed, (lam1, lam2),
+    ((lam1/10, None), (lam2/10, None)))
+sample = lambda rng, N: sample_(rng, N, (lam1_, lam2_), greeks)
+
+acc = run(sample, N, N_chunk, se_abs, se_rel, t_max, seed, workers)
 
-print(f'V0 {V0:.4e}')
-print(f'se V0 {se_V0:.4e}')
+print(f'lam1_ {lam1_:.4e}')
+print(f'lam2_ {lam2_:.4e}')
+if adaptive: print(f'pilot variance reduction factor {factor:.2e}')
+print(f'runs {acc.n}')
+names = ('V0', 'Delta', 'Gamma', 'dV/dlam1', 'dV/dlam2', 'Rho') if greeks else ('V0',)
+for name, x, se_x in zip(names, np.atleast_1d(acc.mean), np.atleast_1d(acc.se)):
+  print(f'{name} {x:.4e}')
+  print(f'se {name} {se_x:.4e}')
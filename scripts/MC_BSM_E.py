@@ -1,12 +1,43 @@
 '''
 Black-Scholes-Merton Monte Carlo simulation to price European options.
+
+Paths are processed in chunks of fixed size, all paths of a chunk advancing
+together, so memory stays bounded regardless of the number of runs. Either
+the Euler-Maruyama scheme is used, or exact log-normal sampling of the
+terminal value, which is all a European option needs. The simulation stops
+early once the s.e. target or time budget is met. Euler can also be run as
+multilevel Monte Carlo to a target RMSE, rather than with a fixed number of
+steps.
+
+Delta, Vega and Rho are pathwise, differentiating the Euler product or the
+log-normal sample along each run. Gamma is a likelihood ratio estimator
+applied to the pathwise Delta for exact sampling, whose density is known, and
+otherwise the central difference of the pathwise Delta with common random
+numbers.
 '''
 
 import numpy as np
+from MC_acc import run
+from MC_qmc import normals as qmc_normals, bridge, replicates
+import MC_MLMC
+from MC_greeks import dpayoff, Gamma_bump
 
 # numerical params
-N = int(4e5) # number of runs
+N = int(4e5) # maximum number of runs
 n = 100 # number of steps per run
+N_chunk = int(1e4) # number of runs per chunk
+scheme = 'Euler' # Euler or exact
+se_abs = None # target absolute s.e., if any
+se_rel = None # target relative s.e., if any
+t_max = None # time budget in seconds, if any
+seed = None # RNG seed, None for fresh entropy
+workers = 1 # number of worker processes
+sampling = 'MC' # MC, QMC (scrambled Sobol, Brownian bridge) or MLMC (Euler)
+m_qmc = 12 # QMC replicates have 2**m_qmc runs
+eps = 1e-2 # MLMC target RMSE
+n_coarse = 2 # MLMC number of steps on the coarsest level
+greeks = True # also estimate Delta, Gamma, Vega and Rho from the same runs (MC, QMC)
+h_Gamma = .02 # relative spot bump for Gamma (Euler)
 # model params
 T = 3 # duration
 r = .06 # risk free interest rate
@@ -18,17 +49,71 @@ K = 70 # strike price
 style = 'call' # call or put
 
 assert style in ('call', 'put')
+assert sampling in ('MC', 'QMC', 'MLMC')
+assert scheme in ('Euler', 'exact')
+assert sampling != 'MLMC' or scheme == 'Euler'
+assert sampling != 'MLMC' or not greeks
 
 dt = T/n
-V0s = []
-for i in range(N):
-  S = S0
-  for j in range(n):
-    x = np.random.normal()
-    S *= 1+(r-q)*dt+sig*dt**.5*x
-  V0s += [max(0, S-K if style == 'call' else K-S)]
-V0 = np.mean(V0s)*np.exp(-r*T)
-var_V0 = np.var(V0s)*np.exp(-2*r*T)
-se_V0 = (var_V0/N)**.5
-
-print(f'V0 {V0:.4e} (s.e. {se_V0:.4e})')
+
+def normals(rng, d, N):
+# d normals per run, in time order.
+  match sampling:
+    case 'MC': return rng.standard_normal((d, N))
+    case 'QMC': return bridge(qmc_normals(rng, m_qmc, d))
+
+def sample(rng, N):
+  match scheme:
+    case 'Euler':
+      S = np.full(N, S0, dtype=float)
+      x = normals(rng, n, N)
+    # Logarithmic derivatives of S in sig and r.
+      dlS_dsig, dlS_dr = np.zeros(N), np.zeros(N)
+      for j in range(n):
+        f = 1+(r-q)*dt+sig*dt**.5*x[j]
+        S *= f
+        if greeks:
+          dlS_dsig += dt**.5*x[j]/f
+          dlS_dr += dt/f
+    case 'exact':
+      x = normals(rng, 1, N)[0]
+      S = S0*np.exp((r-q-sig**2/2)*T+sig*T**.5*x)
+      dlS_dsig, dlS_dr = T**.5*x-sig*T, T
+  V = np.maximum(0, S-K if style == 'call' else K-S)*np.exp(-r*T)
+  if not greeks: return V
+  dV = dpayoff(S, K, style, r, T)
+  match scheme:
+    case 'Euler': Gamma = Gamma_bump(S, S0, K, r, T, h_Gamma)
+    case 'exact': Gamma = dV*S/S0**2*(x/(sig*T**.5)-1)
+  return np.stack((V, dV*S/S0, Gamma, dV*S*dlS_dsig, dV*S*dlS_dr-T*V), axis=-1)
+
+def level(rng, l, N):
+# Fine payoffs with n_coarse 2^l steps minus coarse ones with half as many,
+# each coarse step driven by the sum of two fine increments. Level 0 has no
+# coarse paths, so it draws one increment per step.
+  dt = T/(n_coarse*2**l)
+  S = np.full(N, S0, dtype=float)
+  S_c = S.copy()
+  for _ in range(n_coarse*2**l//2 if l > 0 else n_coarse):
+    x = rng.standard_normal((2 if l > 0 else 1, N))
+    S *= 1+(r-q)*dt+sig*dt**.5*x[0]
+    if l == 0: continue
+    S *= 1+(r-q)*dt+sig*dt**.5*x[1]
+    S_c *= 1+(r-q)*2*dt+sig*dt**.5*(x[0]+x[1])
+  P = lambda S: np.maximum(0, S-K if style == 'call' else K-S)*np.exp(-r*T)
+  return P(S)-(P(S_c) if l > 0 else 0)
+
+match sampling:
+  case 'MC': acc = run(sample, N, N_chunk, se_abs, se_rel, t_max, seed, workers)
+  case 'QMC': acc = run(replicates(sample, m_qmc), N//2**m_qmc, 1, se_abs, se_rel, t_max, seed, workers)
+  case 'MLMC': V0, se_V0, accs, costs = MC_MLMC.run(level, eps, N_chunk=N_chunk, seed=seed)
+if sampling == 'MLMC':
+  for l, (acc, cost) in enumerate(zip(accs, costs)):
+    print(f'level {l} steps {n_coarse*2**l} runs {acc.n} mean {acc.mean:+.4e} var {acc.var:.4e} cost {cost:.2e} s')
+else:
+  N_used = acc.n*(2**m_qmc if sampling == 'QMC' else 1)
+  V0, se_V0 = acc.mean, acc.se
+  print(f'runs {N_used}')
+names = ('V0', 'Delta', 'Gamma', 'Vega', 'Rho') if greeks else ('V0',)
+for name, x, se_x in zip(names, np.atleast_1d(V0), np.atleast_1d(se_V0)):
+  print(f'{name} {x:.4e} (s.e. {se_x:.4e})')
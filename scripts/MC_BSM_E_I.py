@@ -1,13 +1,26 @@
 '''
 Black-Scholes-Merton model Monte Carlo simulation to price European options,
 with importance sampling and antithetic variates.
+
+The drift shift lam is either the formula below, or tuned on a pilot run
+starting from it.
 '''
 
 import numpy as np
+from MC_acc import run
+from MC_IS import tune
 
 # numerical params
-N = int(4e5) # number of runs
+N = int(4e5) # maximum number of runs
 n = 100 # number of steps per run
+N_chunk = int(1e4) # number of runs per chunk
+se_abs = None # target absolute s.e., if any
+se_rel = None # target relative s.e., if any
+t_max = None # time budget in seconds, if any
+seed = None # RNG seed, None for fresh entropy
+workers = 1 # number of worker processes
+adaptive = True # tune lam on a pilot run
+N_pilot = int(1e4) # number of pilot runs
 # model params
 T = 3 # duration
 r = .06 # risk free interest rate
@@ -23,22 +36,25 @@ assert style in ('call', 'put')
 lam = np.log(S0/K)/(sig*T)+(r-q)/sig-sig/2
 
 dt = T/n
-V0s = []
-for i in range(N//2):
-  S1, S2, W1, W2 = S0, S0, 0, 0
+
+def sample_(rng, N, lam):
+  S, W = np.full(N, S0, dtype=float), np.zeros(N)
+  x = rng.standard_normal((n, N))
   for j in range(n):
-    x1, x2 = np.random.normal(size=2)
-    W1 += x1; W2 += x2
-    S1 *= 1+(r-q-sig*lam)*dt+sig*dt**.5*x1
-    S2 *= 1+(r-q-sig*lam)*dt+sig*dt**.5*x2
-  W1 *= dt**.5; W2 *= dt**.5
-  RN1 = np.exp(lam*(W1-.5*lam*T))
-  RN2 = np.exp(lam*(W2-.5*lam*T))
-  V0s += [RN1*max(0, S1-K if style == 'call' else K-S1),
-          RN2*max(0, S2-K if style == 'call' else K-S2)]
-V0 = np.mean(V0s)*np.exp(-r*T)
-var_V0 = np.var(V0s)*np.exp(-2*r*T)
-se_V0 = (var_V0/N)**.5
+    W += x[j]
+    S *= 1+(r-q-sig*lam)*dt+sig*dt**.5*x[j]
+  W *= dt**.5
+  RN = np.exp(lam*(W-.5*lam*T))
+  return RN*np.maximum(0, S-K if style == 'call' else K-S)*np.exp(-r*T)
+
+if adaptive:
+  (lam,), factor = tune(sample_, lam, N_pilot, seed, 0)
+sample = lambda rng, N: sample_(rng, N, lam)
+
+acc = run(sample, N, N_chunk, se_abs, se_rel, t_max, seed, workers)
+V0, se_V0 = acc.mean, acc.se
 
 print(f'lam {lam:+.4e}')
+if adaptive: print(f'pilot variance reduction factor {factor:.2e}')
+print(f'runs {acc.n}')
 print(f'V0 {V0:.4e} (s.e. {se_V0:.4e})')
@@ -1,11 +1,18 @@
 '''
-Cox-Ingersoll-Ross Monte Carlo simulation, Euler-Maruyama with reflection.
+Cox-Ingersoll-Ross Monte Carlo simulation, either Euler-Maruyama with
+reflection or exact (noncentral chi-square) steps, which may be of any size
+and never leave the domain.
+
+Taking the process as a short rate, a zero-coupon bond is priced with few
+exact steps, integrating the rate with the trapezoidal rule, and compared to
+the analytical price.
 '''
 
 import numpy as np
 import matplotlib.pyplot as plt
 from pathlib import Path
 from os import makedirs
+import MC_paths as paths
 
 makedirs(Path.cwd().parent/'out', exist_ok=True)
 plt.rcParams['font.size'] = 14
@@ -17,6 +24,9 @@ plot_save = False
 # numerical params
 N = 32 # number of runs
 n = 500 # number of steps per run
+scheme = 'exact' # Euler or exact
+N_bond = int(1e5) # number of runs for the bond price
+n_bond = 12 # number of exact steps per run for the bond price
 # model params
 T = 3 # duration
 eta = .4 # level of mean reversion
@@ -24,21 +34,38 @@ kap = 1 # spread of mean reversion
 th = .2 # vol-of-vol (vol-of-var)
 v0 = .2 # initial volatility
 
+assert scheme in ('Euler', 'exact')
+
+rng = np.random.default_rng()
 dt = T/n
 v = np.zeros((N, n))
 v[:,0] = v0
 n_reflection = 0
-for j in range(N):
-  for i in range(1, n):
-    x = np.random.normal()
-    v[j,i] = v[j,i-1]+kap*(eta-v[j,i-1])*dt+th*(v[j,i-1]*dt)**.5*x
-    if v[j,i] < 0:
-      v[j,i] *= -1
-      n_reflection += 1
+match scheme:
+  case 'Euler':
+    for i in range(1, n):
+      x = rng.standard_normal(N)
+      v[:,i] = v[:,i-1]+kap*(eta-v[:,i-1])*dt+th*(v[:,i-1]*dt)**.5*x
+      n_reflection += np.sum(v[:,i] < 0)
+      v[:,i] = np.abs(v[:,i])
+  case 'exact':
+    for i, v_ in enumerate(paths.CIR(rng, N, n-1, T*(n-1)/n, v0, eta, kap, th)):
+      v[:,i+1] = v_
+
+# Bond price E[exp(-int_0^T v dt)], against the analytical A exp(-B v0).
+dt_bond = T/n_bond
+I = .5*v0*dt_bond
+for i, v_ in enumerate(paths.CIR(rng, N_bond, n_bond, T, v0, eta, kap, th)):
+  I += v_*dt_bond*(.5 if i == n_bond-1 else 1)
+P = np.exp(-I)
+h = (kap**2+2*th**2)**.5
+D = 2*h+(kap+h)*np.expm1(h*T)
+P_exact = (2*h*np.exp((kap+h)*T/2)/D)**(2*kap*eta/th**2)*np.exp(-2*np.expm1(h*T)/D*v0)
 
 Feller_cond = 2*kap*eta >= th**2
 print(f'Feller condition{'' if Feller_cond else ' not'} satisfied')
-print(f'vol < 0 rate {n_reflection/(n*N):.2e}')
+if scheme == 'Euler': print(f'vol < 0 rate {n_reflection/(n*N):.2e}')
+print(f'bond price {np.mean(P):.4e} (s.e. {np.std(P)/N_bond**.5:.4e}, exact {P_exact:.4e})')
 ts = np.linspace(0, T, n)
 plt.plot(ts, v.T)
 plt.xlim(0, T)
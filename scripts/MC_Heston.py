@@ -1,11 +1,13 @@
 '''
-Heston Monte Carlo simulation, Milstein.
+Heston Monte Carlo simulation, Milstein, Andersen's QE scheme or exact variance
+steps.
 '''
 
 import numpy as np
 import matplotlib.pyplot as plt
 from pathlib import Path
 from os import makedirs
+from MC_paths import Heston_QE, Heston_CIR
 
 makedirs(Path.cwd().parent/'out', exist_ok=True)
 plt.rcParams['font.size'] = 14
@@ -17,6 +19,7 @@ plot_save = False
 # numerical params
 N = 32 # number of runs
 n = 500 # number of steps per run
+scheme = 'Milstein' # Milstein, QE or CIR
 # model params
 T = 3 # duration
 r = .05 # risk free interest rate
@@ -28,24 +31,35 @@ rho = -.6 # vol-stock correlation
 S0 = 120 # initial spot price
 sig0 = .3 # initial volatility
 
+assert scheme in ('Milstein', 'QE', 'CIR')
+
 dt = T/n
 S, v = np.zeros((2, N, n))
 S[:,0] = S0
 v[:,0] = sig0**2
 n_reflection = 0
-for j in range(N):
-  for i in range(1, n):
-    x1, x2 = np.random.normal(size=2)
-    x3 = rho*x1+(1-rho**2)**.5*x2
-    S[j,i] = S[j,i-1]*(1+(r-q)*dt+(v[j,i-1]*dt)**.5*x1)
-    v[j,i] = v[j,i-1]+kap*(eta-v[j,i-1])*dt+th*(v[j,i-1]*dt)**.5*x3+.25*th**2*(x3**2-1)*dt
-    if v[j,i] < 0:
-      v[j,i] *= -1
-      n_reflection += 1
+rng = np.random.default_rng()
+for i in range(1, n):
+  x1, x2 = rng.standard_normal((2, N))
+  match scheme:
+    case 'Milstein':
+      x3 = rho*x1+(1-rho**2)**.5*x2
+      S[:,i] = S[:,i-1]*(1+(r-q)*dt+(v[:,i-1]*dt)**.5*x1)
+      v[:,i] = v[:,i-1]+kap*(eta-v[:,i-1])*dt+th*(v[:,i-1]*dt)**.5*x3+.25*th**2*(x3**2-1)*dt
+      n_reflection += np.sum(v[:,i] < 0)
+      v[:,i] = np.abs(v[:,i])
+    case 'QE':
+      x, v[:,i] = Heston_QE(np.log(S[:,i-1]), v[:,i-1], x1, x2, dt, r, q, eta, kap, th, rho)
+      S[:,i] = np.exp(x)
+      n_reflection += np.sum(v[:,i] == 0)
+    case 'CIR':
+      x, v[:,i] = Heston_CIR(rng, np.log(S[:,i-1]), v[:,i-1], x1, dt, r, q, eta, kap, th, rho)
+      S[:,i] = np.exp(x)
+      n_reflection += np.sum(v[:,i] == 0)
 
 Feller_cond = 2*kap*eta >= th**2
 print(f'Feller condition:{'' if Feller_cond else ' not'} satisfied')
-print(f'vol < 0 rate {n_reflection/(n*N):.2e}')
+print(f'vol {"< 0" if scheme == "Milstein" else "= 0"} rate {n_reflection/(n*N):.2e}')
 
 ts = np.linspace(0, T, n)
 plt.figure(1)
@@ -1,12 +1,46 @@
 '''
 Heston model Monte Carlo simulation to price European options.
+
+Either Milstein with variance reflection is used, or Andersen's QE scheme,
+which stays accurate at far fewer steps and never leaves the domain, or exact
+(noncentral chi-square) variance steps with the Broadie-Kaya log spot. The
+latter draws the variance from the pseudorandom stream even with QMC.
+Optionally the discounted terminal spot, whose mean is known, is used as a
+control variate. Instead of a fixed number of steps, Milstein can also be run
+as multilevel Monte Carlo to a target RMSE.
+
+Greeks come from the same runs. Delta and Rho are pathwise, and Gamma the
+central difference of the pathwise Delta with common random numbers, for free.
+Vega (in sig0) is a central difference too, rerunning each chunk at bumped
+sig0 from the same normals and random stream.
 '''
 
 import numpy as np
+from MC_acc import run
+from MC_qmc import normals as qmc_normals, bridge, replicates
+from MC_paths import Heston_QE, Heston_CIR
+from CM import price
+import MC_MLMC
+from MC_greeks import dpayoff, Gamma_bump
 
 # numerical params
-N = int(4e4) # number of runs
-n = 200 # number of steps per run
+N = int(4e4) # maximum number of runs
+n = 200 # number of steps per run (QE and CIR need only some 10-20 per year)
+N_chunk = int(1e4) # number of runs per chunk
+se_abs = None # target absolute s.e., if any
+se_rel = None # target relative s.e., if any
+t_max = None # time budget in seconds, if any
+seed = None # RNG seed, None for fresh entropy
+workers = 1 # number of worker processes
+sampling = 'MC' # MC, QMC (scrambled Sobol, Brownian bridge) or MLMC (Milstein)
+m_qmc = 10 # QMC replicates have 2**m_qmc runs
+eps = 2e-2 # MLMC target RMSE
+n_coarse = 4 # MLMC number of steps on the coarsest level
+scheme = 'Milstein' # Milstein, QE or CIR
+control = True # terminal spot control variate
+greeks = False # also estimate Delta, Gamma, Vega and Rho from the same runs (MC, QMC, no control)
+h_Gamma = .02 # relative spot bump for Gamma
+h_Vega = .01 # relative sig0 bump for Vega
 # model params
 T = 1 # duration
 r = .05 # risk free interest rate
@@ -22,26 +56,113 @@ K = 100 # strike price
 style = 'call' # call or put
 
 assert style in ('call', 'put')
+assert sampling in ('MC', 'QMC', 'MLMC')
+assert scheme in ('Milstein', 'QE', 'CIR')
+assert sampling != 'MLMC' or scheme == 'Milstein'
+assert not greeks or (sampling != 'MLMC' and not control)
 
 dt = T/n
-V0s = []
-n_reflection = 0
-for i in range(N):
-  S, v = S0, sig0**2
-  for j in range(n):
-    x1, x2 = np.random.normal(size=2)
-    x3 = rho*x1+(1-rho**2)**.5*x2
-    S *= 1+(r-q)*dt+(v*dt)**.5*x1
-    v += kap*(eta-v)*dt+th*(v*dt)**.5*x3+.25*th**2*(x3**2-1)*dt
-    if v < 0:
-      v *= -1
-      n_reflection += 1
-  V0s += [max(0, S-K if style == 'call' else K-S)]
-V0 = np.mean(V0s)*np.exp(-r*T)
-var_V0 = np.var(V0s)*np.exp(-2*r*T)
-se_V0 = (var_V0/N)**.5
+
+def normals(rng, N):
+# Normals of both Brownian motions, in time order. With QMC, the Sobol
+# dimensions are interleaved between the two bridges.
+  match sampling:
+    case 'MC': return rng.standard_normal((2, n, N))
+    case 'QMC':
+      z = qmc_normals(rng, m_qmc, 2*n)
+      return bridge(z[0::2]), bridge(z[1::2])
+
+def Milstein(S, v, x1, x2, dt):
+# Milstein step with variance reflection, also returns the reflection count.
+  x3 = rho*x1+(1-rho**2)**.5*x2
+  S = S*(1+(r-q)*dt+(v*dt)**.5*x1)
+  v = v+kap*(eta-v)*dt+th*(v*dt)**.5*x3+.25*th**2*(x3**2-1)*dt
+  return S, np.abs(v), np.sum(v < 0)
+
+def terminal(rng, x1, x2, sig0):
+# Terminal spot prices, their logarithmic derivative in r, and the number of
+# reflections for Milstein, or of steps ending at 0 variance otherwise.
+  N = x1.shape[1]
+  S, v = np.full(N, S0, dtype=float), np.full(N, sig0**2)
+  n_reflection = 0
+  dlS_dr = T
+  match scheme:
+    case 'Milstein':
+      dlS_dr = np.zeros(N)
+      for j in range(n):
+        S_, v, n_reflection_ = Milstein(S, v, x1[j], x2[j], dt)
+        if greeks: dlS_dr += dt*S/S_
+        S = S_
+        n_reflection += n_reflection_
+    case 'QE':
+      x = np.log(S)
+      for j in range(n):
+        x, v = Heston_QE(x, v, x1[j], x2[j], dt, r, q, eta, kap, th, rho)
+        n_reflection += np.sum(v == 0)
+      S = np.exp(x)
+    case 'CIR':
+      x = np.log(S)
+      for j in range(n):
+        x, v = Heston_CIR(rng, x, v, x1[j], dt, r, q, eta, kap, th, rho)
+        n_reflection += np.sum(v == 0)
+      S = np.exp(x)
+  return S, dlS_dr, n_reflection
+
+def sample(rng, N):
+# The tally is that of terminal.
+  x1, x2 = normals(rng, N)
+  state = rng.bit_generator.state
+  S, dlS_dr, n_reflection = terminal(rng, x1, x2, sig0)
+  V = np.maximum(0, S-K if style == 'call' else K-S)*np.exp(-r*T)
+  if control: V = np.stack([V, S*np.exp(-r*T)], axis=-1)
+  if not greeks: return V, n_reflection
+  Vs = []
+  for sig0_ in (sig0*(1+h_Vega), sig0*(1-h_Vega)):
+    rng.bit_generator.state = state
+    S_ = terminal(rng, x1, x2, sig0_)[0]
+    Vs += [np.maximum(0, S_-K if style == 'call' else K-S_)*np.exp(-r*T)]
+  dV = dpayoff(S, K, style, r, T)
+  return np.stack((V, dV*S/S0, Gamma_bump(S, S0, K, r, T, h_Gamma),
+    (Vs[0]-Vs[1])/(2*h_Vega*sig0), dV*S*dlS_dr-T*V), axis=-1), n_reflection
+
+def level(rng, l, N):
+# Fine payoffs with n_coarse 2^l steps minus coarse ones with half as many,
+# each coarse step driven by the sum of two fine increments. Level 0 has no
+# coarse paths, so it draws one pair of increments per step.
+  dt = T/(n_coarse*2**l)
+  S, v = np.full(N, S0, dtype=float), np.full(N, sig0**2)
+  S_c, v_c = S.copy(), v.copy()
+  for _ in range(n_coarse*2**l//2 if l > 0 else n_coarse):
+    x1, x2 = rng.standard_normal((2, 2 if l > 0 else 1, N))
+    S, v, _ = Milstein(S, v, x1[0], x2[0], dt)
+    if l == 0: continue
+    S, v, _ = Milstein(S, v, x1[1], x2[1], dt)
+    S_c, v_c, _ = Milstein(S_c, v_c, (x1[0]+x1[1])/2**.5, (x2[0]+x2[1])/2**.5, 2*dt)
+  P = lambda S: np.maximum(0, S-K if style == 'call' else K-S)*np.exp(-r*T)
+  return P(S)-(P(S_c) if l > 0 else 0)
+
+EC = [S0*np.exp(-q*T)] if control else None
+match sampling:
+  case 'MC': acc = run(sample, N, N_chunk, se_abs, se_rel, t_max, seed, workers, EC)
+  case 'QMC': acc = run(replicates(sample, m_qmc), N//2**m_qmc, 1, se_abs, se_rel, t_max, seed, workers, EC)
+  case 'MLMC': V0, se_V0, accs, costs = MC_MLMC.run(level, eps, N_chunk=N_chunk, seed=seed)
+if sampling != 'MLMC':
+  N_used = acc.n*(2**m_qmc if sampling == 'QMC' else 1)
+  V0, se_V0 = acc.mean, acc.se
+# Carr-Madan reference, to show the discretization bias.
+V0_ref = price('Heston', (S0, r, q, eta, kap, th, rho, sig0), T, K, style == 'call')
 
 Feller_cond = 2*kap*eta >= th**2
 print(f'Feller condition{'' if Feller_cond else ' not'} satisfied')
-print(f'vol < 0 rate {n_reflection/(n*N):.2e}')
-print(f'V0 {V0:.4e} (s.e. {se_V0:.4e})')
+if sampling == 'MLMC':
+  for l, (acc, cost) in enumerate(zip(accs, costs)):
+    print(f'level {l} steps {n_coarse*2**l} runs {acc.n} mean {acc.mean:+.4e} var {acc.var:.4e} cost {cost:.2e} s')
+else:
+  print(f'vol {"< 0" if scheme == "Milstein" else "= 0"} rate {acc.tally/(n*N_used):.2e}')
+  print(f'runs {N_used}')
+names = ('V0', 'Delta', 'Gamma', 'Vega', 'Rho') if greeks else ('V0',)
+for name, x, se_x in zip(names, np.atleast_1d(V0), np.atleast_1d(se_V0)):
+  print(f'{name} {x:.4e} (s.e. {se_x:.4e})')
+if control and sampling != 'MLMC': print(f'variance reduction factor {acc.var_plain/acc.var:.2e}')
+V0, se_V0 = np.atleast_1d(V0)[0], np.atleast_1d(se_V0)[0]
+print(f'V0 Carr-Madan {V0_ref:.4e} (bias {(V0-V0_ref)/se_V0:+.1f} s.e.)')
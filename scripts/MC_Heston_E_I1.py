@@ -1,13 +1,28 @@
 '''
 Heston model Monte Carlo simulation to price European options, with importance
 sampling.
+
+The drift shift lam is either fixed, or tuned on a pilot run.
 '''
 
 import numpy as np
+from MC_acc import run
+from MC_qmc import normals as qmc_normals, bridge, replicates
+from MC_IS import tune
 
 # numerical params
-N = int(4e4) # number of runs
+N = int(4e4) # maximum number of runs
 n = 200 # number of steps per run
+N_chunk = int(1e4) # number of runs per chunk
+se_abs = None # target absolute s.e., if any
+se_rel = None # target relative s.e., if any
+t_max = None # time budget in seconds, if any
+seed = None # RNG seed, None for fresh entropy
+workers = 1 # number of worker processes
+sampling = 'MC' # MC or QMC (scrambled Sobol, Brownian bridge)
+m_qmc = 10 # QMC replicates have 2**m_qmc runs
+adaptive = True # tune lam on a pilot run, starting from the value below
+N_pilot = int(5e3) # number of pilot runs
 # model params
 T = 1 # duration
 r = .05 # risk free interest rate
@@ -23,32 +38,48 @@ K = 100 # strike price
 style = 'call' # call or put
 
 assert style in ('call', 'put')
+assert sampling in ('MC', 'QMC')
 
-lam = -.7
+lam = -.7 # drift shift of the spot Brownian motion
 
 dt = T/n
-V0s = []
-n_reflection = 0
-for i in range(N):
-  S, v, W1, W2 = S0, sig0**2, 0, 0
+
+def normals(rng, N, qmc):
+# Normals of both Brownian motions, in time order. With QMC, the Sobol
+# dimensions are interleaved between the two bridges.
+  if not qmc: return rng.standard_normal((2, n, N))
+  z = qmc_normals(rng, m_qmc, 2*n)
+  return bridge(z[0::2]), bridge(z[1::2])
+
+def sample_(rng, N, lam, qmc=False):
+# The pilot is pseudorandom, of N_pilot runs; QMC is for the production run only.
+  S, v = np.full(N, S0, dtype=float), np.full(N, sig0**2)
+  n_reflection = 0
+  x1, x2 = normals(rng, N, qmc)
   for j in range(n):
-    x1, x2 = np.random.normal(size=2)
-    W1 += x1; W2 += x2
-    x3 = rho*x1+(1-rho**2)**.5*x2
-    S *= 1+(r-q-lam*v**.5)*dt+(v*dt)**.5*x1
+    x3 = rho*x1[j]+(1-rho**2)**.5*x2[j]
+    S *= 1+(r-q-lam*v**.5)*dt+(v*dt)**.5*x1[j]
     v += kap*(eta-v)*dt+th*(v*dt)**.5*x3+.25*th**2*(x3**2-1)*dt
-    if v < 0:
-      v *= -1
-      n_reflection += 1
-  W1 *= dt**.5; W2 *= dt**.5
+    n_reflection += np.sum(v < 0)
+    v = np.abs(v)
+  W1, W2 = np.sum(x1, axis=0)*dt**.5, np.sum(x2, axis=0)*dt**.5
   RN = np.exp(lam*W1-lam*rho/(1-rho**2)**.5*W2-lam**2*T/2/(1-rho**2))
-  V0s += [RN*max(0, S-K if style == 'call' else K-S)]
-V0 = np.mean(V0s)*np.exp(-r*T)
-var_V0 = np.var(V0s)*np.exp(-2*r*T)
-se_V0 = (var_V0/N)**.5
+  return RN*np.maximum(0, S-K if style == 'call' else K-S)*np.exp(-r*T), n_reflection
+
+if adaptive:
+  (lam,), factor = tune(sample_, lam, N_pilot, seed, 0)
+sample = lambda rng, N: sample_(rng, N, lam, sampling == 'QMC')
+
+match sampling:
+  case 'MC': acc = run(sample, N, N_chunk, se_abs, se_rel, t_max, seed, workers)
+  case 'QMC': acc = run(replicates(sample, m_qmc), N//2**m_qmc, 1, se_abs, se_rel, t_max, seed, workers)
+N_used = acc.n*(2**m_qmc if sampling == 'QMC' else 1)
+V0, se_V0 = acc.mean, acc.se
 
 Feller_cond = 2*kap*eta >= th**2
 print(f'Feller condition{'' if 2*kap*eta >= th**2 else ' not'} satisfied')
-print(f'vol < 0 rate {n_reflection/(n*N):.2e}')
+print(f'vol < 0 rate {acc.tally/(n*N_used):.2e}')
 print(f'lam {lam:+.4e}')
+if adaptive: print(f'pilot variance reduction factor {factor:.2e}')
+print(f'runs {N_used}')
 print(f'V0 {V0:.4e} (s.e. {se_V0:.4e})')
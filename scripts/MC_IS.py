@@ -0,0 +1,42 @@
+'''
+Tuning of importance sampling parameters from a pilot run.
+
+The measure change parameters minimize the relative variance (variance over
+squared mean) of a short pilot run. Every evaluation reuses the same random
+stream (common random numbers), which makes the objective a deterministic and
+mostly smooth function of the parameters, so Nelder-Mead can minimize it.
+Dividing by the squared mean keeps the optimizer away from measures under
+which the pilot sees no payoff at all, whose variance is 0 too.
+The variance reduction is then measured on a fresh stream of the same size,
+since on the stream that was optimized over it would be overstated.
+
+Not a script itself; imported by the Monte Carlo pricers.
+'''
+
+import numpy as np
+from scipy.optimize import minimize
+
+def tune(sample, lam0, N, seed=None, lam_plain=None, bounds=None):
+# sample(rng, N, lam) returns N samples, or the samples and a tally, under the
+# measure with parameters lam. Starts from lam0, and returns the tuned
+# parameters and the variance reduction factor relative to lam_plain (plain
+# Monte Carlo) if given, otherwise relative to lam0, out of sample. The factor
+# is infinite if the reference saw no payoff at all.
+# bounds, pairs of lower and upper bounds (or None) per parameter, keep the
+# search within the valid measures.
+  seed = np.random.SeedSequence(seed)
+# Not a spawned child, which would coincide with a chunk stream of MC_acc.run.
+  seed_eval = np.random.SeedSequence(seed.generate_state(4))
+  def stats(lam, seed=seed):
+    x = sample(np.random.default_rng(seed), N, lam)
+    if isinstance(x, tuple): x = x[0]
+    return np.mean(x), np.var(x)
+  def objective(lam):
+    mean, var = stats(lam)
+    return np.log(var)-2*np.log(mean) if mean > 0 and 0 < var < np.inf else np.inf
+  lam0 = np.atleast_1d(np.asarray(lam0, dtype=float))
+  lam = minimize(objective, lam0, method='Nelder-Mead', bounds=bounds,
+    options={'xatol': 1e-3, 'fatol': 1e-3}).x
+  ref = lam0 if lam_plain is None else lam_plain
+  var_ref = stats(ref, seed_eval)[1]
+  return lam, var_ref/stats(lam, seed_eval)[1] if var_ref > 0 else np.inf
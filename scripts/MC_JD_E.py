@@ -0,0 +1,77 @@
+'''
+Jump diffusion (Merton or Kou) Monte Carlo simulation to price European and
+continuously monitored barrier options.
+
+The simulation is event driven: each run is sampled only at its jump times
+(and expiry), so the cost scales with the number of jumps rather than with a
+time grid. Barriers are handled by weighting each run with its probability of
+not crossing between events, a conditional Monte Carlo estimator. European
+prices are compared to Carr-Madan.
+'''
+
+import numpy as np
+from MC_acc import run
+import MC_jumps as jumps
+from CM import price
+
+# numerical params
+N = int(1e6) # maximum number of runs
+N_chunk = int(1e5) # number of runs per chunk
+se_abs = None # target absolute s.e., if any
+se_rel = None # target relative s.e., if any
+t_max = None # time budget in seconds, if any
+seed = None # RNG seed, None for fresh entropy
+workers = 1 # number of worker processes
+# model params
+model = 'Merton' # Merton or Kou
+T = 1 # duration
+r = .05 # risk free interest rate
+q = .02 # dividend rate
+sig = .2 # diffusion volatility
+S0 = 100 # initial spot price
+lam = 1 # jump rate
+mu_J = -.1 # mean log jump (Merton)
+sig_J = .15 # log jump volatility (Merton)
+p_J = .3 # probability of an up jump (Kou)
+eta1 = 25 # rate of the up jumps (Kou)
+eta2 = 10 # rate of the down jumps (Kou)
+# option params
+option = 'barrier' # European or barrier
+K = 100 # strike price
+style = 'call' # call or put
+B = 130 # barrier
+kind = 'up-out' # up-in, up-out, down-in or down-out
+
+assert style in ('call', 'put')
+assert model in ('Merton', 'Kou')
+assert option in ('European', 'barrier')
+assert kind in ('up-in', 'up-out', 'down-in', 'down-out')
+
+match model:
+  case 'Merton':
+    params = (sig, lam, mu_J, sig_J)
+    jumps_ = lambda rng, n: jumps.jumps_Merton(rng, n, mu_J, sig_J)
+    comp = jumps.comp_Merton(mu_J, sig_J)
+  case 'Kou':
+    params = (sig, lam, p_J, eta1, eta2)
+    jumps_ = lambda rng, n: jumps.jumps_Kou(rng, n, p_J, eta1, eta2)
+    comp = jumps.comp_Kou(p_J, eta1, eta2)
+
+def sample(rng, N):
+  match option:
+    case 'European':
+      S = jumps.terminal(rng, N, T, S0, r, q, sig, lam, jumps_, comp)
+      w = 1
+    case 'barrier':
+      S, w = jumps.barrier(rng, N, T, S0, r, q, sig, lam, jumps_, comp, B, kind[:2] == 'up')
+      if kind[-2:] == 'in': w = 1-w
+  return np.maximum(0, S-K if style == 'call' else K-S)*w*np.exp(-r*T)
+
+acc = run(sample, N, N_chunk, se_abs, se_rel, t_max, seed, workers)
+V0, se_V0 = acc.mean, acc.se
+
+print(f'runs {acc.n}')
+print(f'V0 {V0:.4e} (s.e. {se_V0:.4e})')
+if option == 'European':
+  V0_CM = price(model, (S0, r, q, *params), T, K, style == 'call')
+  print(f'Carr-Madan {V0_CM:.4e} ({(V0-V0_CM)/se_V0:+.1f} s.e.)')
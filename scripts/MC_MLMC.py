@@ -0,0 +1,60 @@
+'''
+Multilevel Monte Carlo driver (Giles).
+
+Level l simulates with n0 2^l steps, and its samples are the differences of the
+payoffs of fine and coarse (half as many steps) paths driven by the same
+Brownian increments, level 0 just the coarsest payoffs. The sum of the level
+means telescopes to the finest level's price, at a cost dominated by the many
+cheap coarse samples. The variance and cost (wall time per sample) of every
+level are estimated as the simulation goes, the number of samples per level is
+chosen to minimize the total cost for a target RMSE eps, and levels are added
+until the remaining bias, extrapolated from the means of the finest levels, is
+below eps/sqrt(2). For a weak order 1 scheme whose level variances decay as
+fast as the cost grows, the cost is O(eps^-2 log(eps)^2) rather than the
+O(eps^-3) of a single level.
+
+Not a script itself; imported by the Monte Carlo pricers.
+'''
+
+import numpy as np
+from time import perf_counter
+from MC_acc import Acc, chunk
+
+def run(level, eps, L_min=2, L_max=10, N0=int(1e3), N_chunk=int(1e4), seed=None):
+# level(rng, l, N) returns N samples of level l. Returns the estimate, its
+# s.e., and per level the accumulator and the cost per sample in seconds. Each
+# chunk draws from its own SeedSequence.spawn stream, as in MC_acc.
+  seeds = np.random.SeedSequence(seed)
+  accs, times = [], []
+  def sample(l, N):
+    for i in range(0, N, N_chunk):
+      t0 = perf_counter()
+      accs[l].merge(chunk(lambda rng, N_: level(rng, l, N_), seeds.spawn(1)[0], min(N_chunk, N-i)))
+      times[l] += perf_counter()-t0
+  dN = []
+  for _ in range(L_min+1):
+    accs += [Acc()]
+    times += [0.]
+    dN += [N0]
+  while True:
+    for l, dN_l in enumerate(dN):
+      if dN_l > 0: sample(l, dN_l)
+    n = np.array([acc.n for acc in accs])
+    V = np.array([acc.var for acc in accs])
+    C = np.array(times)/n
+  # Optimal numbers of samples, sampling more while they grow by over 1%.
+    N_opt = np.ceil(2/eps**2*(V/C)**.5*np.sum((V*C)**.5)).astype(int)
+    dN = list(np.maximum(0, N_opt-n))
+    if np.any(dN > .01*n): continue
+  # Weak order alpha from the decay of the level means, at least 1/2.
+    L = len(accs)-1
+    Y = np.abs([acc.mean for acc in accs])
+    alpha = max(.5, -np.polyfit(np.arange(1, L+1), np.log2(Y[1:]), 1)[0])
+    bias = max(Y[-1], Y[-2]/2**alpha)/(2**alpha-1)
+    if bias <= eps/2**.5 or L == L_max: break
+    accs += [Acc()]
+    times += [0.]
+    dN += [N0]
+  mean = sum(acc.mean for acc in accs)
+  se = sum(acc.var/acc.n for acc in accs)**.5
+  return mean, se, accs, C
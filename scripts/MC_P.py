@@ -0,0 +1,114 @@
+'''
+Monte Carlo simulation to price path-dependent options (Asian, barrier,
+lookback, cliquet) under the Black-Scholes-Merton, Heston, variance gamma,
+bilateral gamma, Merton or Kou model.
+
+The payoff statistics are updated as each step is generated, so memory is
+O(N) rather than O(N n), and knocked out runs are dropped from the simulation.
+Optionally control variates with known means are simulated along: the
+discounted terminal spot, the European option (Carr-Madan), and for
+Black-Scholes-Merton the discretely monitored geometric Asian option (closed
+form), which is very effective for arithmetic Asians. Knocked out runs are then
+kept, the controls need them.
+'''
+
+import numpy as np
+from scipy.special import ndtr
+from MC_acc import run
+import MC_paths as paths
+from MC_payoffs import Asian, Barrier, Lookback, Cliquet, Controls, simulate
+from CM import price
+
+# numerical params
+N = int(1e5) # maximum number of runs
+n = 252 # number of steps (monitoring dates) per run
+N_chunk = int(1e4) # number of runs per chunk
+se_abs = None # target absolute s.e., if any
+se_rel = None # target relative s.e., if any
+t_max = None # time budget in seconds, if any
+seed = None # RNG seed, None for fresh entropy
+workers = 1 # number of worker processes
+controls = ('spot', 'European') # any of spot, European, geometric Asian (BSM only)
+# model params
+model = 'BSM' # BSM, Heston, VG, BG, Merton or Kou
+T = 1 # duration
+r = .05 # risk free interest rate
+q = .02 # dividend rate
+S0 = 100 # initial spot price
+sig = .2 # volatility (BSM, VG, Merton, Kou)
+eta = .04 # level of mean reversion (Heston)
+kap = 1 # spread of mean reversion (Heston)
+th = .1 # vol-of-vol (Heston), drift (VG)
+rho = -.3 # vol-stock correlation (Heston)
+sig0 = .2 # initial volatility (Heston)
+nu = .2 # jump (VG)
+al1 = 1.18 # alpha^+ (BG)
+lam1 = 10.57 # lambda^+ (BG)
+al2 = 1.44 # alpha^- (BG)
+lam2 = 5.57 # lambda^- (BG)
+lam = 1 # jump rate (Merton, Kou)
+mu_J = -.1 # mean log jump (Merton)
+sig_J = .15 # log jump volatility (Merton)
+p_J = .3 # probability of an up jump (Kou)
+eta1 = 25 # rate of the up jumps (Kou)
+eta2 = 10 # rate of the down jumps (Kou)
+# option params
+option = 'barrier' # Asian, geometric Asian, barrier, lookback or cliquet
+K = 100 # strike price
+style = 'call' # call or put
+B = 120 # barrier
+kind = 'up-out' # up-in, up-out, down-in or down-out
+n_reset = 21 # number of steps per cliquet period
+cliquet_caps = (0, .05, 0, .3) # local floor and cap, global floor and cap
+
+assert style in ('call', 'put')
+assert model in ('BSM', 'Heston', 'VG', 'BG', 'Merton', 'Kou')
+assert option in ('Asian', 'geometric Asian', 'barrier', 'lookback', 'cliquet')
+assert model == 'BSM' or 'geometric Asian' not in controls
+
+# Means of the discounted controls.
+match model:
+  case 'BSM': params = (S0, r, q, sig)
+  case 'Heston': params = (S0, r, q, eta, kap, th, rho, sig0)
+  case 'VG': params = (S0, r, q, nu, th, sig)
+  case 'BG': params = (S0, r, q, al1, lam1, al2, lam2)
+  case 'Merton': params = (S0, r, q, sig, lam, mu_J, sig_J)
+  case 'Kou': params = (S0, r, q, sig, lam, p_J, eta1, eta2)
+EC = []
+for c in controls:
+  match c:
+    case 'spot': EC += [S0*np.exp(-q*T)]
+    case 'European': EC += [price(model, params, T, K, style == 'call')]
+    case 'geometric Asian':
+    # log of the geometric average of the n spot prices is normal.
+      mu = np.log(S0)+(r-q-sig**2/2)*T*(n+1)/(2*n)
+      s = sig*(T*(n+1)*(2*n+1)/(6*n**2))**.5
+      d2 = (mu-np.log(K))/s
+      sgn = 1 if style == 'call' else -1
+      EC += [sgn*np.exp(-r*T)*(np.exp(mu+s**2/2)*ndtr(sgn*(d2+s))-K*ndtr(sgn*d2))]
+
+def sample(rng, N):
+  match model:
+    case 'BSM': gen = paths.BSM(rng, N, n, T, S0, r, q, sig)
+    case 'Heston': gen = paths.Heston(rng, N, n, T, S0, r, q, eta, kap, th, rho, sig0)
+    case 'VG': gen = paths.VG(rng, N, n, T, S0, r, q, nu, th, sig)
+    case 'BG': gen = paths.BG(rng, N, n, T, S0, r, q, al1, lam1, al2, lam2)
+    case 'Merton': gen = paths.Merton(rng, N, n, T, S0, r, q, sig, lam, mu_J, sig_J)
+    case 'Kou': gen = paths.Kou(rng, N, n, T, S0, r, q, sig, lam, p_J, eta1, eta2)
+  match option:
+    case 'Asian': payoff = Asian(K, style)
+    case 'geometric Asian': payoff = Asian(K, style, geometric=True)
+    case 'barrier': payoff = Barrier(K, style, B, kind)
+    case 'lookback': payoff = Lookback(style, K)
+    case 'cliquet': payoff = Cliquet(n_reset, *cliquet_caps)
+  if controls: payoff = Controls(payoff, controls, K, style)
+  return simulate(gen, payoff, S0, N)*np.exp(-r*T)
+
+acc = run(sample, N, N_chunk, se_abs, se_rel, t_max, seed, workers, EC if controls else None)
+V0, se_V0 = acc.mean, acc.se
+
+print(f'runs {acc.n}')
+print(f'V0 {V0:.4e} (s.e. {se_V0:.4e})')
+if controls:
+  print('control coefficients '+' '.join(f'{b:+.4e}' for b in acc.beta))
+  print(f'variance reduction factor {acc.var_plain/acc.var:.2e}')
@@ -1,11 +1,12 @@
 '''
 Three different Poisson point process Monte Carlo simulations.
-1: all samples in 1 step, placed uniformly
+1: all samples in 1 step, placed uniformly, stored flat for all runs (CSR)
 2: a number of steps with a number of samples in each
 3: many steps, most of them with 0 samples, some with 1
 '''
 
 import numpy as np
+from MC_jumps import events
 import matplotlib.pyplot as plt
 from pathlib import Path
 from os import makedirs
@@ -26,18 +27,21 @@ n3 = 100000 # number of steps per run for 3rd method
 T = 10 # duration
 lam = 10 # Poisson point process rate
 
-N1 = np.random.poisson(lam*T, N)
-t1 = [np.sort(np.random.uniform(size=N1_)*T) for N1_ in N1]
-x1 = [np.searchsorted(t1_, np.linspace(0, T, n1)) for t1_ in t1]
+rng = np.random.default_rng()
 
-x2 = np.cumsum(np.random.poisson(lam*T/n2, (N, n2)), axis=-1)
+# The counts at the grid times follow from one search for all runs, offsetting
+# the times of run i by 2Ti so they are globally sorted.
+offsets, run, t = events(rng, N, T, lam)
+x1 = np.searchsorted(t+2*T*run, np.linspace(0, T, n1)+2*T*np.arange(N)[:,None])-offsets[:-1,None]
 
-x3 = np.cumsum(np.random.uniform(size=(N, n3)) < lam*T/n3, axis=-1)
+x2 = np.cumsum(rng.poisson(lam*T/n2, (N, n2)), axis=-1)
+
+x3 = np.cumsum(rng.uniform(size=(N, n3)) < lam*T/n3, axis=-1)
 
 t1 = np.linspace(0, T, n1)
 t2 = np.linspace(0, T, n2)
 t3 = np.linspace(0, T, n3)
-for x1_ in x1: plt.plot(t1, x1_, c='red', alpha=.5)
+plt.plot(t1, x1.T, c='red', alpha=.5)
 plt.plot(t2, x2.T, c='green', alpha=.5)
 plt.plot(t3, x3.T, c='blue', alpha=.5)
 plt.plot([], c='red', label='method 1', alpha=.5)
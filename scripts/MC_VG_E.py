@@ -1,12 +1,30 @@
 '''
 A variance-gamma model Monte Carlo simulation to price European options.
+
+A sum of i.i.d. gamma increments is gamma itself, so the terminal value is
+sampled exactly from two gamma draws per run, unless full paths are asked for.
+
+Delta, Vega and Rho are pathwise, the gamma shapes not depending on sig, so the
+draws scale with it. Gamma is the central difference of the pathwise Delta with
+common random numbers, for free.
 '''
 
 import numpy as np
+from MC_acc import run
+from MC_greeks import dpayoff, Gamma_bump
 
 # numerical params
-N = int(4e4) # number of runs
-n = 1000 # number of steps per run
+N = int(4e4) # maximum number of runs
+n = 1000 # number of steps per run, for full paths
+N_chunk = int(1e4) # number of runs per chunk (lower it for full paths)
+terminal = True # sample only the terminal value, exactly
+se_abs = None # target absolute s.e., if any
+se_rel = None # target relative s.e., if any
+t_max = None # time budget in seconds, if any
+seed = None # RNG seed, None for fresh entropy
+workers = 1 # number of worker processes
+greeks = True # also estimate Delta, Gamma, Vega and Rho from the same runs
+h_Gamma = .02 # relative spot bump for Gamma
 # model params
 T = 3 # duration
 r = .06 # risk free interest rate
@@ -26,16 +44,27 @@ mu_q = .5*(th**2+2*sig**2/nu)**.5-.5*th
 nu_p = mu_p**2*nu
 nu_q = mu_q**2*nu
 om = 1/nu*np.log(1-.5*sig**2*nu-th*nu)
+# Derivatives in sig of mu_p and mu_q (equal) and of om.
+dmu = sig/nu/(th**2+2*sig**2/nu)**.5
+dom = -sig/(1-.5*sig**2*nu-th*nu)
+
+def sample(rng, N):
+  if terminal:
+    gam1T = rng.gamma(T*mu_p**2/nu_p, nu_p/mu_p, N)
+    gam2T = rng.gamma(T*mu_q**2/nu_q, nu_q/mu_q, N)
+  else:
+    gam1T = np.sum(rng.gamma(T/n*mu_p**2/nu_p, nu_p/mu_p, (N, n)), axis=-1)
+    gam2T = np.sum(rng.gamma(T/n*mu_q**2/nu_q, nu_q/mu_q, (N, n)), axis=-1)
+  S = S0*np.exp((r-q+om)*T+gam1T-gam2T)
+  V = np.maximum(0, S-K if style == 'call' else K-S)*np.exp(-r*T)
+  if not greeks: return V
+  dV = dpayoff(S, K, style, r, T)
+  dS_dsig = S*(dom*T+dmu*(gam1T/mu_p-gam2T/mu_q))
+  return np.stack((V, dV*S/S0, Gamma_bump(S, S0, K, r, T, h_Gamma), dV*dS_dsig, dV*T*S-T*V), axis=-1)
+
+acc = run(sample, N, N_chunk, se_abs, se_rel, t_max, seed, workers)
 
-V0s = []
-for i in range(N):
-  gam1 = np.random.gamma(T/n*mu_p**2/nu_p, nu_p/mu_p, n)
-  gam2 = np.random.gamma(T/n*mu_q**2/nu_q, nu_q/mu_q, n)
-  x = np.cumsum(gam1-gam2)
-  S = S0*np.exp((r-q+om)*T+x[-1])
-  V0s += [max(0, S-K if style == 'call' else K-S)]
-V0 = np.mean(V0s)*np.exp(-r*T)
-var_V0 = np.var(V0s)*np.exp(-2*r*T)
-se_V0 = (var_V0/N)**.5
-
-print(f'V0 {V0:.4e} (s.e. {se_V0:.4e})')
+print(f'runs {acc.n}')
+names = ('V0', 'Delta', 'Gamma', 'Vega', 'Rho') if greeks else ('V0',)
+for name, x, se_x in zip(names, np.atleast_1d(acc.mean), np.atleast_1d(acc.se)):
+  print(f'{name} {x:.4e} (s.e. {se_x:.4e})')
@@ -0,0 +1,164 @@
+'''
+Streaming mean/variance accumulator for Monte Carlo estimators, and a driver
+that feeds it chunk by chunk until a stopping rule is met.
+
+With control variates, the co-moments of the estimator and the controls are
+accumulated too, so the optimal control coefficients are estimated online from
+the same samples.
+
+Chunks can be sharded over a process pool. Every chunk draws from its own
+SeedSequence.spawn stream and chunks are merged in order, so a given seed
+gives bit-identical results regardless of the number of workers.
+
+Not a script itself; imported by the Monte Carlo pricers.
+'''
+
+import numpy as np
+from time import perf_counter
+from collections import deque
+from itertools import islice
+from concurrent.futures import ProcessPoolExecutor
+from multiprocessing import get_context
+
+class Acc:
+# Chunk statistics use numpy's pairwise summation, and are merged with the
+# parallel form of Welford's update (Chan et al.), so accumulators of separate
+# runs can be merged exactly. Samples are along axis 0; several estimators can
+# be accumulated side by side along further axes. The tally sums diagnostics
+# such as reflection counts.
+  def __init__(self, n=0, mean=0., M2=0., tally=0):
+    self.n = n
+    self.mean = mean
+    self.M2 = M2
+    self.tally = tally
+
+  def add(self, x, tally=0):
+    x = np.asarray(x, dtype=float)
+    mean = np.mean(x, axis=0)
+    self.merge(Acc(x.shape[0], mean, np.sum((x-mean)**2, axis=0), tally))
+
+  def merge(self, other):
+    self.tally = self.tally+other.tally
+    if other.n == 0: return
+    n = self.n+other.n
+    d = other.mean-self.mean
+    self.mean = self.mean+d*(other.n/n)
+    self.M2 = self.M2+other.M2+d**2*(self.n*other.n/n)
+    self.n = n
+
+  @property
+  def var(self):
+    return self.M2/self.n
+
+  @property
+  def se(self):
+    return (self.var/self.n)**.5
+
+class AccCV:
+# Accumulates samples (N, 1+k) of an estimator Y and k control variates C with
+# known means EC, keeping the full co-moment matrix (merged like Acc). mean, M2,
+# var and se are those of the controlled estimator Y-beta(C-EC), with the
+# variance minimizing beta = Cov(C, C)^-1 Cov(C, Y) of the samples so far.
+# Estimating beta from the same samples biases the mean by only O(1/n).
+  def __init__(self, EC, n=0, mean=0., M2=0., tally=0):
+    self.EC = np.asarray(EC, dtype=float)
+    self.n = n
+    self.mean_ = mean
+    self.M2_ = M2
+    self.tally = tally
+
+  def add(self, x, tally=0):
+    x = np.asarray(x, dtype=float)
+    mean = np.mean(x, axis=0)
+    self.merge(AccCV(self.EC, x.shape[0], mean, (x-mean).T@(x-mean), tally))
+
+  def merge(self, other):
+    self.tally = self.tally+other.tally
+    if other.n == 0: return
+    n = self.n+other.n
+    d = other.mean_-self.mean_
+    self.mean_ = self.mean_+d*(other.n/n)
+    self.M2_ = self.M2_+other.M2_+np.outer(d, d)*(self.n*other.n/n)
+    self.n = n
+
+  @property
+  def beta(self):
+    return np.linalg.lstsq(self.M2_[1:,1:], self.M2_[1:,0], rcond=None)[0]
+
+  @property
+  def mean(self):
+    return self.mean_[0]-self.beta@(self.mean_[1:]-self.EC)
+
+  @property
+  def M2(self):
+    return self.M2_[0,0]-self.M2_[0,1:]@self.beta
+
+  @property
+  def var(self):
+    return self.M2/self.n
+
+  @property
+  def se(self):
+    return (self.var/self.n)**.5
+
+  @property
+  def var_plain(self):
+  # Variance of Y alone, var_plain/var is the variance reduction factor.
+    return self.M2_[0,0]/self.n
+
+def chunk(sample, seed, N, EC=None):
+# sample(rng, N) returns N samples, or the samples and a tally. With control
+# means EC, the samples are (N, 1+k), the estimator followed by the controls.
+  x = sample(np.random.default_rng(seed), N)
+  acc = Acc() if EC is None else AccCV(EC)
+  if isinstance(x, tuple): acc.add(*x)
+  else: acc.add(x)
+  return acc
+
+# Worker processes are forked, so the sampler is inherited rather than
+# pickled, and may be any function or closure of the calling script.
+_sample = None
+_EC = None
+
+def _init(sample, EC):
+  global _sample, _EC
+  _sample, _EC = sample, EC
+
+def _chunk(seed, N):
+  return chunk(_sample, seed, N, _EC)
+
+def run(sample, N, N_chunk, se_abs=None, se_rel=None, t_max=None, seed=None, workers=1, controls=None):
+# Calls sample(rng, N_) for chunks of N_ <= N_chunk samples until N samples are
+# used, the s.e. is at most se_abs or se_rel times the magnitude of the mean,
+# or t_max seconds have passed. A zero variance never meets a s.e. target,
+# since it just means nothing has been sampled in the tail yet. Stopping is
+# decided in chunk order, chunks computed past that point are discarded.
+# controls are the means of the control variates the samples come with, if any.
+# With several estimators side by side (such as a price and its Greeks), the
+# s.e. targets apply to the first one only.
+  acc = Acc() if controls is None else AccCV(controls)
+  t0 = perf_counter()
+  seeds = np.random.SeedSequence(seed)
+  Ns = (min(N_chunk, N-i) for i in range(0, N, N_chunk))
+  jobs = ((seeds.spawn(1)[0], N_) for N_ in Ns)
+  def stop():
+    M2, se, mean = (np.ravel(x)[0] for x in (acc.M2, acc.se, acc.mean))
+    if M2 > 0:
+      if se_abs is not None and se <= se_abs: return True
+      if se_rel is not None and se <= se_rel*np.abs(mean): return True
+    return t_max is not None and perf_counter()-t0 > t_max
+  if workers == 1:
+    for seed_, N_ in jobs:
+      acc.merge(chunk(sample, seed_, N_, controls))
+      if stop(): break
+    return acc
+  with ProcessPoolExecutor(workers, get_context('fork'), _init, (sample, controls)) as pool:
+    futures = deque(pool.submit(_chunk, *job) for job in islice(jobs, 2*workers))
+    while futures:
+      acc.merge(futures.popleft().result())
+      if stop():
+        pool.shutdown(cancel_futures=True)
+        break
+      job = next(jobs, None)
+      if job is not None: futures.append(pool.submit(_chunk, *job))
+  return acc
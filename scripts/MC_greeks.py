@@ -0,0 +1,28 @@
+'''
+Monte Carlo Greeks of European options, computed from the same runs as the
+price.
+
+Pathwise estimators differentiate the discounted payoff along each run, which
+is valid where the payoff is continuous, so for Delta, Vega and Rho of vanilla
+options. Gamma needs the derivative of a discontinuous pathwise Delta; it is
+either a likelihood ratio estimator where the density is known, or a central
+difference with common random numbers: the terminal spot price of every model
+here scales with the initial one, so the bumped runs are the same runs scaled,
+at no extra simulation cost.
+
+Not a script itself; imported by the Monte Carlo pricers.
+'''
+
+import numpy as np
+
+def dpayoff(S, K, style, r, T):
+# Derivative of the discounted vanilla payoff in the terminal spot price S,
+# which exists almost everywhere. Pathwise Greeks are dpayoff times dS/dparam.
+  return np.exp(-r*T)*(S > K if style == 'call' else -1.*(S < K))
+
+def Gamma_bump(S, S0, K, r, T, h):
+# Central difference of the pathwise Delta over relative spot bumps of h, with
+# S the terminal spot prices at S0. Calls and puts have the same Gamma.
+  X = S/S0
+  in_ = (X > K/(S0*(1+h))) & (X <= K/(S0*(1-h)))
+  return np.exp(-r*T)*X*in_/(2*h*S0)
@@ -0,0 +1,79 @@
+'''
+Event-driven simulation of compound Poisson jumps and of jump diffusions
+(Merton, Kou) built on them.
+
+The jumps of all N runs are stored flat, in CSR layout: the jumps of run i are
+at indices offsets[i]:offsets[i+1] of the arrays of jump times (sorted per run)
+and sizes, run holding the run of each jump. Work and memory scale with the
+number of jumps, not with a time grid. Between jumps a jump diffusion is a
+Brownian motion with drift, which is sampled exactly from event to event; a
+continuously monitored barrier is handled with the Brownian bridge crossing
+probability between events, so it needs no time grid either.
+
+Not a script itself; imported by the Monte Carlo simulations and pricers.
+'''
+
+import numpy as np
+
+def events(rng, N, T, lam, last=False):
+# Times of a rate lam Poisson process on (0, T) for N runs, as offsets (N+1,),
+# run and t. With last, every run gets a final event at T.
+  n = rng.poisson(lam*T, N)+last
+  offsets = np.zeros(N+1, dtype=int)
+  np.cumsum(n, out=offsets[1:])
+  run = np.repeat(np.arange(N), n)
+  t = rng.uniform(0, T, offsets[-1])
+  if last: t[offsets[1:]-1] = T
+  return offsets, run, t[np.lexsort((t, run))]
+
+# Log jump size samplers, and their compensators E[exp(J)]-1.
+
+def jumps_Merton(rng, n, mu_J, sig_J):
+# Normal.
+  return mu_J+sig_J*rng.standard_normal(n)
+
+def comp_Merton(mu_J, sig_J):
+  return np.exp(mu_J+sig_J**2/2)-1
+
+def jumps_Kou(rng, n, p, eta1, eta2):
+# Up with probability p, exponential with rate eta1 up and eta2 down.
+  up = rng.uniform(size=n) < p
+  return np.where(up, rng.exponential(1/eta1, n), -rng.exponential(1/eta2, n))
+
+def comp_Kou(p, eta1, eta2):
+  return p*eta1/(eta1-1)+(1-p)*eta2/(eta2+1)-1
+
+def terminal(rng, N, T, S0, r, q, sig, lam, jumps, comp):
+# Spot prices at T of N runs of the jump diffusion with log jumps sampled by
+# jumps(rng, n) and compensator comp.
+  offsets, run, t = events(rng, N, T, lam)
+  x = (r-q-lam*comp-sig**2/2)*T+sig*T**.5*rng.standard_normal(N)
+  x += np.bincount(run, jumps(rng, t.size), N)
+  return S0*np.exp(x)
+
+def barrier(rng, N, T, S0, r, q, sig, lam, jumps, comp, B, up):
+# Spot prices at T of N runs of the jump diffusion, and the probabilities of
+# not having crossed the barrier B (from below if up, else from above),
+# conditional on the values at the events. Per event, a diffusion interval is
+# followed by a jump, the last event at T having no jump. Crossing is certain
+# if either end of the interval or the value after the jump is past B, and
+# otherwise has probability exp(-2 b0 b1/(sig^2 dt)), b0 and b1 the distances
+# to B in log spot at the ends.
+  offsets, run, t = events(rng, N, T, lam, last=True)
+  start, end = offsets[:-1], offsets[1:]-1
+  dt = np.diff(t, prepend=0)
+  dt[start] = t[start]
+  J = jumps(rng, t.size)
+  J[end] = 0
+  dx = (r-q-lam*comp-sig**2/2)*dt+sig*dt**.5*rng.standard_normal(t.size)
+# Log spot after each event relative to S0, a cumulative sum per run.
+  x = np.cumsum(dx+J)
+  x -= np.repeat(x[start]-dx[start]-J[start], end-start+1)
+  s = 1 if up else -1
+  b = np.log(B/S0)
+  b2 = s*(b-x)
+  b1 = b2+s*J
+  b0 = b1+s*dx
+  with np.errstate(divide='ignore', invalid='ignore'):
+    p = np.where((b0 > 0) & (b1 > 0) & (b2 > 0), -np.expm1(-2*b0*b1/(sig**2*dt)), 0)
+  return S0*np.exp(x[end]), np.multiply.reduceat(p, start)
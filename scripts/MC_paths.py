@@ -0,0 +1,154 @@
+'''
+Vectorized time steps of the Monte Carlo path generators, advancing all paths
+of a chunk at once.
+
+Not a script itself; imported by the Monte Carlo simulations and pricers.
+'''
+
+import numpy as np
+from scipy.special import ndtr
+import MC_jumps as jumps
+
+def Heston_QE(x, v, z1, z2, dt, r, q, eta, kap, th, rho, psi_c=1.5):
+# Andersen's quadratic-exponential step of the log spot price x and variance v
+# (with martingale correction), from independent normals z1 (spot) and z2
+# (variance). The variance is sampled from a moment-matched squared normal or,
+# for small values, from a point mass at 0 mixed with an exponential, so it
+# never leaves the domain.
+  E = np.exp(-kap*dt)
+  K1 = .5*dt*(kap*rho/th-.5)-rho/th
+  K2 = .5*dt*(kap*rho/th-.5)+rho/th
+  K3 = K4 = .5*dt*(1-rho**2)
+  A = K2+.5*K4
+  m = eta+(v-eta)*E
+  s2 = v*th**2*E/kap*(1-E)+eta*th**2/(2*kap)*(1-E)**2
+  psi = s2/m**2
+  v_ = np.empty_like(v)
+  K0 = np.empty_like(v)
+# Quadratic branch.
+  i = psi <= psi_c
+  b2 = 2/psi[i]-1+(2/psi[i])**.5*(2/psi[i]-1)**.5
+  a = m[i]/(1+b2)
+  v_[i] = a*(b2**.5+z2[i])**2
+  K0[i] = -A*b2*a/(1-2*A*a)+.5*np.log(1-2*A*a)
+# Exponential branch, 1-U = Phi(-z2) to keep the tail accurate.
+  i = ~i
+  p = (psi[i]-1)/(psi[i]+1)
+  beta = (1-p)/m[i]
+  U_ = ndtr(-z2[i])
+  v_[i] = np.where(U_ < 1-p, np.log((1-p)/U_)/beta, 0)
+  K0[i] = -np.log(p+beta*(1-p)/(beta-A))
+  K0 -= (K1+.5*K3)*v
+  x = x+(r-q)*dt+K0+K1*v+K2*v_+(K3*v+K4*v_)**.5*z1
+  return x, v_
+
+def CIR_exact(rng, v, dt, eta, kap, th):
+# Exact CIR transition over any dt, a scaled noncentral chi-square.
+  c = th**2*(1-np.exp(-kap*dt))/(4*kap)
+  return c*rng.noncentral_chisquare(4*kap*eta/th**2, v*np.exp(-kap*dt)/c)
+
+def Heston_CIR(rng, x, v, z1, dt, r, q, eta, kap, th, rho):
+# Heston step of the log spot price x and variance v with the exact variance
+# transition (drawn from rng) and the Broadie-Kaya log spot given both ends of
+# the variance, the integrated variance approximated by the trapezoidal rule.
+# z1 are the normals of the spot.
+  v_ = CIR_exact(rng, v, dt, eta, kap, th)
+  I = .5*(v+v_)*dt
+  x = x+(r-q)*dt-.5*I+rho/th*(v_-v-kap*eta*dt+kap*I)+((1-rho**2)*I)**.5*z1
+  return x, v_
+
+# Path generators, yielding the spot prices of all runs after each of n steps,
+# so that only O(N) memory is needed. The caller may send back a boolean mask
+# of the runs to keep simulating, e.g. to drop knocked out runs.
+
+def BSM(rng, N, n, T, S0, r, q, sig):
+# Exact log-normal steps.
+  dt = T/n
+  S = np.full(N, S0, dtype=float)
+  for _ in range(n):
+    S = S*np.exp((r-q-sig**2/2)*dt+sig*dt**.5*rng.standard_normal(S.size))
+    keep = yield S
+    if keep is not None: S = S[keep]
+
+def Heston(rng, N, n, T, S0, r, q, eta, kap, th, rho, sig0, scheme='QE'):
+# QE steps, or exact variance steps (CIR).
+  dt = T/n
+  x, v = np.full(N, np.log(S0)), np.full(N, sig0**2)
+  for _ in range(n):
+    match scheme:
+      case 'QE':
+        z1, z2 = rng.standard_normal((2, x.size))
+        x, v = Heston_QE(x, v, z1, z2, dt, r, q, eta, kap, th, rho)
+      case 'CIR':
+        x, v = Heston_CIR(rng, x, v, rng.standard_normal(x.size), dt, r, q, eta, kap, th, rho)
+    keep = yield np.exp(x)
+    if keep is not None: x, v = x[keep], v[keep]
+
+def CIR(rng, N, n, T, v0, eta, kap, th):
+# Exact steps, of any size.
+  dt = T/n
+  v = np.full(N, v0, dtype=float)
+  for _ in range(n):
+    v = CIR_exact(rng, v, dt, eta, kap, th)
+    keep = yield v
+    if keep is not None: v = v[keep]
+
+def VG(rng, N, n, T, S0, r, q, nu, th, sig):
+# Difference of gamma processes.
+  dt = T/n
+  mu_p = .5*(th**2+2*sig**2/nu)**.5+.5*th
+  mu_q = .5*(th**2+2*sig**2/nu)**.5-.5*th
+  nu_p = mu_p**2*nu
+  nu_q = mu_q**2*nu
+  om = 1/nu*np.log(1-.5*sig**2*nu-th*nu)
+  x = np.full(N, np.log(S0))
+  for _ in range(n):
+    x = x+(r-q+om)*dt+rng.gamma(dt*mu_p**2/nu_p, nu_p/mu_p, x.size)\
+      -rng.gamma(dt*mu_q**2/nu_q, nu_q/mu_q, x.size)
+    keep = yield np.exp(x)
+    if keep is not None: x = x[keep]
+
+def BG(rng, N, n, T, S0, r, q, al1, lam1, al2, lam2):
+# Difference of gamma processes.
+  dt = T/n
+  xi = -al1*np.log(lam1/(lam1-1))-al2*np.log(lam2/(lam2+1))
+  x = np.full(N, np.log(S0))
+  for _ in range(n):
+    x = x+(r-q+xi)*dt+rng.gamma(dt*al1, 1/lam1, x.size)-rng.gamma(dt*al2, 1/lam2, x.size)
+    keep = yield np.exp(x)
+    if keep is not None: x = x[keep]
+
+def JD(rng, N, n, T, S0, r, q, sig, lam, jumps_, comp):
+# Jump diffusion with log jumps sampled by jumps_(rng, n) and compensator comp.
+# Exact log-normal diffusion steps; the jumps are drawn up front in CSR layout
+# and grouped by step, so each step only touches its own jumps.
+  dt = T/n
+  offsets, run, t = jumps.events(rng, N, T, lam)
+  J = jumps_(rng, t.size)
+  k = np.minimum((t/dt).astype(int), n-1)
+  order = np.argsort(k, kind='stable')
+  bounds = np.searchsorted(k[order], np.arange(n+1))
+# pos maps the runs to their index in x, -1 once dropped.
+  pos = np.arange(N)
+  x = np.full(N, np.log(S0))
+  for i in range(n):
+    x = x+(r-q-lam*comp-sig**2/2)*dt+sig*dt**.5*rng.standard_normal(x.size)
+    j = order[bounds[i]:bounds[i+1]]
+    j = j[pos[run[j]] >= 0]
+    np.add.at(x, pos[run[j]], J[j])
+    keep = yield np.exp(x)
+    if keep is not None:
+      x = x[keep]
+      alive = np.flatnonzero(pos >= 0)[keep]
+      pos[:] = -1
+      pos[alive] = np.arange(alive.size)
+
+def Merton(rng, N, n, T, S0, r, q, sig, lam, mu_J, sig_J):
+# Normal log jumps.
+  yield from JD(rng, N, n, T, S0, r, q, sig, lam,
+    lambda rng, n: jumps.jumps_Merton(rng, n, mu_J, sig_J), jumps.comp_Merton(mu_J, sig_J))
+
+def Kou(rng, N, n, T, S0, r, q, sig, lam, p, eta1, eta2):
+# Double exponential log jumps.
+  yield from JD(rng, N, n, T, S0, r, q, sig, lam,
+    lambda rng, n: jumps.jumps_Kou(rng, n, p, eta1, eta2), jumps.comp_Kou(p, eta1, eta2))
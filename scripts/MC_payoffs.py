@@ -0,0 +1,148 @@
+'''
+Path-dependent payoffs whose statistics (running sums, extrema, barrier hits)
+are updated step by step as the paths are generated, so that no paths are
+stored.
+
+Not a script itself; imported by the Monte Carlo pricers.
+'''
+
+import numpy as np
+
+def vanilla(S, K, style):
+  return np.maximum(0, S-K if style == 'call' else K-S)
+
+class Payoff:
+# Started with the initial spot price of N runs, updated with the spot prices
+# after every step, and finally valued given the terminal spot prices. Payoffs
+# may report runs that are settled, which then need no further simulation and
+# are dropped from the updates via compact.
+  def settled(self):
+    return None
+
+  def compact(self, keep):
+    pass
+
+class Asian(Payoff):
+# Average of the spot prices after each step, arithmetic or geometric.
+  def __init__(self, K, style, geometric=False):
+    self.K, self.style, self.geometric = K, style, geometric
+
+  def start(self, S0, N):
+    self.sum, self.n = np.zeros(N), 0
+
+  def update(self, S):
+    self.sum += np.log(S) if self.geometric else S
+    self.n += 1
+
+  def value(self, S):
+    A = self.sum/self.n
+    return vanilla(np.exp(A) if self.geometric else A, self.K, self.style)
+
+class Barrier(Payoff):
+# Vanilla option that is knocked in or out (kind up-in, up-out, down-in or
+# down-out) when the spot price crosses B at any step. Knocked out runs are
+# settled at 0.
+  def __init__(self, K, style, B, kind):
+    assert kind in ('up-in', 'up-out', 'down-in', 'down-out')
+    self.K, self.style, self.B, self.kind = K, style, B, kind
+
+  def start(self, S0, N):
+    self.hit = np.full(N, S0 >= self.B if self.kind[:2] == 'up' else S0 <= self.B)
+    self.i = np.arange(N)
+    self.N = N
+
+  def update(self, S):
+    self.hit |= S >= self.B if self.kind[:2] == 'up' else S <= self.B
+
+  def settled(self):
+    return self.hit if self.kind[-3:] == 'out' else None
+
+  def compact(self, keep):
+    self.hit, self.i = self.hit[keep], self.i[keep]
+
+  def value(self, S):
+    V = np.zeros(self.N)
+    V[self.i] = vanilla(S, self.K, self.style)*(self.hit if self.kind[-2:] == 'in' else ~self.hit)
+    return V
+
+class Lookback(Payoff):
+# Fixed strike on the extremum if K is given, otherwise floating strike.
+  def __init__(self, style, K=None):
+    self.style, self.K = style, K
+
+  def start(self, S0, N):
+    self.min, self.max = np.full((2, N), S0, dtype=float)
+
+  def update(self, S):
+    np.minimum(self.min, S, out=self.min)
+    np.maximum(self.max, S, out=self.max)
+
+  def value(self, S):
+    if self.K is None: return S-self.min if self.style == 'call' else self.max-S
+    return vanilla(self.max if self.style == 'call' else self.min, self.K, self.style)
+
+class Cliquet(Payoff):
+# Sum of the returns over every n_reset steps, each clipped to (F_loc, C_loc),
+# the sum clipped to (F_glob, C_glob). A final partial period is ignored.
+  def __init__(self, n_reset, F_loc, C_loc, F_glob, C_glob):
+    self.n_reset = n_reset
+    self.F_loc, self.C_loc, self.F_glob, self.C_glob = F_loc, C_loc, F_glob, C_glob
+
+  def start(self, S0, N):
+    self.S_reset, self.sum, self.n = np.full(N, S0, dtype=float), np.zeros(N), 0
+
+  def update(self, S):
+    self.n += 1
+    if self.n%self.n_reset == 0:
+      self.sum += np.clip(S/self.S_reset-1, self.F_loc, self.C_loc)
+      self.S_reset = S
+
+  def value(self, S):
+    return np.clip(self.sum, self.F_glob, self.C_glob)
+
+class Controls(Payoff):
+# Wraps a payoff, appending control variates to its values as further columns:
+# the terminal spot price ('spot'), the vanilla option on it ('European'), and
+# the vanilla option on the geometric average of the spot prices after each
+# step ('geometric Asian'). No runs are settled, the controls need all of them.
+  def __init__(self, payoff, controls, K, style):
+    assert all(c in ('spot', 'European', 'geometric Asian') for c in controls)
+    self.payoff, self.controls, self.K, self.style = payoff, controls, K, style
+    self.Asian = Asian(K, style, geometric=True)
+
+  def start(self, S0, N):
+    self.payoff.start(S0, N)
+    self.Asian.start(S0, N)
+
+  def update(self, S):
+    self.payoff.update(S)
+    self.Asian.update(S)
+
+  def value(self, S):
+    V = [self.payoff.value(S)]
+    for c in self.controls:
+      match c:
+        case 'spot': V += [S]
+        case 'European': V += [vanilla(S, self.K, self.style)]
+        case 'geometric Asian': V += [self.Asian.value(S)]
+    return np.stack(V, axis=-1)
+
+def simulate(paths, payoff, S0, N):
+# Feeds the spot prices of the path generator to the payoff, dropping runs as
+# the payoff settles them, and returns the payoffs of all N runs.
+  payoff.start(S0, N)
+  S = next(paths)
+  while True:
+    payoff.update(S)
+    settled = payoff.settled()
+    keep = None
+    if settled is not None and np.any(settled):
+      keep = ~settled
+      payoff.compact(keep)
+      if not np.any(keep):
+        paths.close()
+        break
+    try: S_ = paths.send(keep)
+    except StopIteration: break
+    S = S_
+  return payoff.value(S[keep] if keep is not None else S)
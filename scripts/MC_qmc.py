@@ -0,0 +1,50 @@
+'''
+Quasi-Monte Carlo normals for the Monte Carlo pricers: scrambled Sobol points
+mapped to normals, with Brownian bridge construction of the paths so that the
+first (best distributed) Sobol dimensions fix the coarse shape of each path.
+Standard errors come from independently scrambled replicates.
+
+Not a script itself; imported by the Monte Carlo pricers.
+'''
+
+import numpy as np
+from scipy.stats import qmc
+from scipy.special import ndtri
+
+def normals(rng, m, d):
+# 2**m scrambled Sobol points in d dimensions as standard normals, shape (d, 2**m).
+  u = qmc.Sobol(d, scramble=True, seed=rng).random_base2(m)
+  return ndtri(u).T
+
+def bridge(z):
+# Maps normals z (n, N), ordered by importance, to the normalized Brownian
+# increments of n equal steps, in time order. z[0] fixes the endpoint, then
+# midpoints are filled in breadth first.
+  n = len(z)
+  W = np.zeros((n+1, *z.shape[1:]))
+  W[n] = n**.5*z[0]
+  k = 1
+  intervals = [(0, n)]
+  while intervals:
+    l, r = intervals.pop(0)
+    if r-l < 2: continue
+    m = (l+r)//2
+    W[m] = ((r-m)*W[l]+(m-l)*W[r])/(r-l)+((m-l)*(r-m)/(r-l))**.5*z[k]
+    k += 1
+    intervals += [(l, m), (m, r)]
+  return np.diff(W, axis=0)
+
+def replicates(sample, m):
+# Turns sample(rng, N) into a sampler of the means of N QMC replicates of 2**m
+# points each, each replicate scrambled with its own random stream. Any tally
+# returned by sample is summed.
+  def sample_(rng, N):
+    means, tally = [], 0
+    for _ in range(N):
+      x = sample(rng, 2**m)
+      if isinstance(x, tuple):
+        x, tally_ = x
+        tally += tally_
+      means += [np.mean(x, axis=0)]
+    return np.array(means), tally
+  return sample_
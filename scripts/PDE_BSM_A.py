@@ -0,0 +1,152 @@
+'''
+The Black-Scholes PDE with early exercise, to price American calls and puts.
+
+The spot grid is non-uniform, a sinh stretching concentrating the nodes around
+the strike where the payoff kink and the exercise boundary are, and runs from
+S=0 (where the PDE needs no boundary condition) to a multiple of the strike
+(where Gamma=0 is assumed). Time stepping is Crank-Nicolson with Rannacher
+smoothing. Each step is a linear complementarity problem, V >= payoff, solved
+either by the penalty method (a few banded solves, adding a large penalty
+wherever V drops below the payoff until the set of such nodes stops changing)
+or by projected SOR with red-black ordering.
+One solve gives the price curve over all spots, and the early exercise
+boundary as a function of time.
+'''
+
+import numpy as np
+from scipy.interpolate import CubicSpline
+from scipy.linalg import solve_banded
+import matplotlib.pyplot as plt
+from pathlib import Path
+from os import makedirs
+
+makedirs(Path.cwd().parent/'out', exist_ok=True)
+plt.rcParams['font.size'] = 14
+plt.rcParams['figure.figsize'] = (5, 4)
+plt.rcParams['text.usetex'] = True
+
+# plot params
+plot_save = False
+# numerical params
+method = 'penalty' # penalty or PSOR
+n_S = 201 # number of spot prices
+n_t = 200 # number of time steps
+n_Rannacher = 2 # number of initial CN steps done as two implicit half steps
+a = 4 # S range is [0, a K]
+c = .1 # grid concentration around K, smaller is denser, in units of K
+penalty = 1e8 # penalty factor
+omega = 1.2 # PSOR relaxation factor
+tol = 1e-8 # PSOR tolerance
+n_iter_max = 100 # maximum number of penalty or PSOR iterations per step
+# model params
+T = 1 # duration
+r = .05 # risk-free interest rate
+q = .02 # dividend rate
+sig = .2 # volatility
+S0 = 90 # initial spot price
+# option params
+K = 100 # strike price
+style = 'put' # call or put
+
+assert style in ('call', 'put')
+assert method in ('penalty', 'PSOR')
+
+def grid(K):
+# Spot grid, K+cK sinh(xi) for xi uniform, from 0 to aK.
+  xi = np.linspace(np.arcsinh(-1/c), np.arcsinh((a-1)/c), n_S)
+  S = K*(1+c*np.sinh(xi))
+  S[0] = 0
+  return S
+
+def operator(S, r, q, sig):
+# Tridiagonal operator L, dV/dtau = L V, with three point differences on the
+# non-uniform grid. L V = -r V at S=0, and Gamma=0 with an upwind Delta at
+# the upper end.
+  hm, hp = np.diff(S)[:-1], np.diff(S)[1:]
+  a_, b_ = sig**2*S[1:-1]**2/2, (r-q)*S[1:-1]
+  lo, di, up = np.zeros((3, len(S)))
+  lo[1:-1] = (2*a_-b_*hp)/(hm*(hm+hp))
+  di[1:-1] = (-2*a_+b_*(hp-hm))/(hm*hp)-r
+  up[1:-1] = (2*a_+b_*hm)/(hp*(hm+hp))
+  di[0] = -r
+  h = S[-1]-S[-2]
+  lo[-1] = -(r-q)*S[-1]/h
+  di[-1] = (r-q)*S[-1]/h-r
+  return lo, di, up
+
+def solve(K, T, r, q, sig, style):
+# Returns the spot grid, the prices at t=0, the times, and the early exercise
+# boundary at those times (nan where there is none).
+  S = grid(K)
+  g = np.maximum(0, S-K if style == 'call' else K-S)
+  lo, di, up = operator(S, r, q, sig)
+  def step(V, dt, th):
+  # Theta scheme step of the complementarity problem
+  # min((I-th dt L) V_new-(I+(1-th) dt L) V, V_new-g) = 0.
+    rhs = V+(1-th)*dt*(di*V+np.r_[0, lo[1:]*V[:-1]]+np.r_[up[:-1]*V[1:], 0])
+    ab = np.zeros((3, n_S))
+    ab[0,1:] = -th*dt*up[:-1]
+    ab[1] = 1-th*dt*di
+    ab[2,:-1] = -th*dt*lo[1:]
+    match method:
+      case 'penalty':
+        active = V < g
+        for _ in range(n_iter_max):
+          ab_ = ab.copy()
+          ab_[1] += penalty*active
+          V = solve_banded((1, 1), ab_, rhs+penalty*active*g)
+          active_ = V < g
+          if np.array_equal(active, active_): break
+          active = active_
+        return V, active
+      case 'PSOR':
+      # Red-black ordering: even nodes only neighbour odd ones and vice versa, so
+      # each half sweep is a single vectorized projected update.
+        V = np.maximum(g, rhs)
+        for _ in range(n_iter_max):
+          V_ = V.copy()
+          for j in (0, 1):
+            nb = np.r_[0, ab[2,:-1]*V[:-1]]+np.r_[ab[0,1:]*V[1:], 0]
+            V[j::2] = np.maximum(g[j::2], V[j::2]+omega*((rhs[j::2]-nb[j::2])/ab[1,j::2]-V[j::2]))
+          if np.max(np.abs(V-V_)) < tol: break
+        return V, V <= g+tol
+  dt = T/n_t
+  t = T-dt*np.arange(n_t+1)
+  S_ex = np.full(n_t+1, np.nan)
+# At expiry the boundary is the strike, moved out by the dividends.
+  match style:
+    case 'call': S_ex[0] = K*max(1, r/q) if q > 0 else np.nan
+    case 'put': S_ex[0] = K*min(1, r/q) if q > 0 else K
+  V = g.copy()
+  for i in range(n_t):
+    if i < n_Rannacher:
+      V, _ = step(V, dt/2, 1)
+      V, exercised = step(V, dt/2, 1)
+    else: V, exercised = step(V, dt, .5)
+  # The boundary is the exercised in-the-money node closest to the strike.
+    exercised &= g > 0
+    if exercised.any():
+      S_ex[i+1] = S[exercised].max() if style == 'put' else S[exercised].min()
+  return S, V, t, S_ex
+
+S, V, t, S_ex = solve(K, T, r, q, sig, style)
+print(f'V0 {CubicSpline(S, V)(S0):.4e}')
+print(f'exercise boundary at t=0 {S_ex[-1]:.4e}')
+
+plt.plot(S, np.maximum(0, S-K if style == 'call' else K-S), '--', c='black', label='intrinsic')
+plt.plot(S, V, c='red', label='American')
+plt.xlim(0, 2*K)
+plt.xlabel('$S_0$')
+plt.ylabel('$V_0$')
+plt.legend()
+plt.tight_layout()
+if plot_save: plt.savefig(Path.cwd()/'out'/'PDE_BSM_A.png', bbox_inches='tight', dpi=400)
+else: plt.show()
+
+plt.plot(t, S_ex, c='black')
+plt.xlim(0, T)
+plt.xlabel('$t$')
+plt.ylabel('$S^*$')
+plt.tight_layout()
+if plot_save: plt.savefig(Path.cwd()/'out'/'PDE_BSM_A_boundary.png', bbox_inches='tight', dpi=400)
+else: plt.show()
@@ -1,13 +1,21 @@
 '''
 The Black-Scholes PDE, to price European calls and puts.
 
-FTCS PDE integration scheme is used, but backward Euler naturally.
+The PDE is integrated backward from expiry with the theta scheme: FTCS
+(explicit), implicit Euler, or Crank-Nicolson. The implicit schemes solve a
+tridiagonal system per time step with a banded solver, and are stable for any
+time step; Crank-Nicolson starts with a few implicit Euler half steps
+(Rannacher smoothing) to damp the oscillations from the payoff kink. For FTCS,
+von Neumann stability analysis is performed. Several strikes sharing the grid
+are solved in one sweep.
 A Neumann boundary condition is used, fixing the values to those of the
-initial condition at expiry. Von Neumann stability analysis is performed.
+initial condition at expiry.
 '''
 
 import numpy as np
 from scipy.interpolate import CubicSpline
+from scipy.linalg import solve_banded
+from scipy.stats import norm as normal
 import matplotlib.pyplot as plt
 from pathlib import Path
 from os import makedirs
@@ -20,8 +28,10 @@ plt.rcParams['text.usetex'] = True
 # plot params
 plot_save = False
 # numerical params
+scheme = 'CN' # FTCS, implicit or CN
 n_S = 301 # number of spot prices (should be odd ideally, so that it contains S0)
-n_t = 100000 # number of time steps
+n_t = 200 # number of time steps (FTCS needs some 100000)
+n_Rannacher = 2 # number of initial CN steps done as two implicit half steps
 a = 3 # scale factor for S range
 # model params
 T = 3 # duration
@@ -29,34 +39,65 @@ r = .05 # risk free interest rate
 sig = .4 # volatility
 S0 = 100 # initial spot price
 # option params
-K = 70 # strike price
+K = np.array([60, 70, 80]) # strike prices, sharing one grid
 style = 'call' # call or put
 
 assert style in ('call', 'put')
+assert scheme in ('FTCS', 'implicit', 'CN')
 
-dt = T/(n_t-1)
-t = np.linspace(0, T, n_t)
+dt = T/n_t
 S0s = S0+np.linspace(-1, 1, n_S)*S0*sig*T*a
 dS0 = 2/(n_S-1)*S0*sig*T*a
-stable = dt <= dS0**2/(S0s[-1]*sig)**2
-assert stable
-V0 = np.maximum(0, (S0s-K) if style == 'call' else (K-S0s))
+if scheme == 'FTCS':
+  stable = dt <= dS0**2/(S0s[-1]*sig)**2
+  assert stable
+V0 = np.maximum(0, (S0s[:,None]-K) if style == 'call' else (K-S0s[:,None]))
 plt.plot(S0s, V0, c='black')
+# Tridiagonal operator L, dV/dtau = L V + f, with centered differences in
+# space. Neumann boundary condition, call L: Delta=0, R: Delta=1, put L:
+# Delta=-1, R: Delta=0.
+lo = sig**2*S0s**2/(2*dS0**2)-r*S0s/(2*dS0)
+di = -sig**2*S0s**2/dS0**2-r
+up = sig**2*S0s**2/(2*dS0**2)+r*S0s/(2*dS0)
+lo[[0, -1]] = up[[0, -1]] = 0
+di[[0, -1]] = -r
+f = np.zeros(n_S)
+match style:
+  case 'call': f[-1] = r*S0s[-1]
+  case 'put': f[0] = -r*S0s[0]
+f = f[:,None]
+
+def L(V):
+  LV = di[:,None]*V
+  LV[1:] += lo[1:,None]*V[:-1]
+  LV[:-1] += up[:-1,None]*V[1:]
+  return LV
+
+def step(V, dt, th):
+# Theta scheme, (I-th dt L) V_new = (I+(1-th) dt L) V+dt f.
+  V = V+(1-th)*dt*L(V)+dt*f
+  if th == 0: return V
+  ab = np.zeros((3, n_S))
+  ab[0,1:] = -th*dt*up[:-1]
+  ab[1] = 1-th*dt*di
+  ab[2,:-1] = -th*dt*lo[1:]
+  return solve_banded((1, 1), ab, V)
+
 for i in range(n_t):
-# Centered difference in space.
-  Delta = (V0[2:]-V0[:-2])/(2*dS0)
-  Gamma = (V0[2:]-2*V0[1:-1]+V0[:-2])/dS0
-  match style: # Neumann boundary condition
-    case 'call': # L: Delta=0, R: Delta=1
-      V0[0] -= dt*(r*V0[0])
-      V0[-1] -= dt*(-r*S0s[-1]+r*V0[-1])
-    case 'put': # L: Delta=-1, R: Delta=0
-      V0[0] -= dt*(r*S0s[0]+r*V0[0])
-      V0[-1] -= dt*(r*V0[-1])
-# Forward Euler in time.
-  V0[1:-1] -= dt*(-sig**2*S0s[1:-1]**2/2*Gamma-r*S0s[1:-1]*Delta+r*V0[1:-1])
+  match scheme:
+    case 'FTCS': V0 = step(V0, dt, 0)
+    case 'implicit': V0 = step(V0, dt, 1)
+    case 'CN':
+      if i < n_Rannacher: V0 = step(step(V0, dt/2, 1), dt/2, 1)
+      else: V0 = step(V0, dt, .5)
 
-print(f'V0 {CubicSpline(S0s, V0)(S0):.4e}')
+d1 = (np.log(S0/K)+(r+sig**2/2)*T)/(sig*T**.5)
+d2 = d1-sig*T**.5
+match style:
+  case 'call': V0_exact = S0*normal.cdf(d1)-K*np.exp(-r*T)*normal.cdf(d2)
+  case 'put': V0_exact = -S0*normal.cdf(-d1)+K*np.exp(-r*T)*normal.cdf(-d2)
+for K_, V0_, V0_exact_ in zip(K, CubicSpline(S0s, V0)(S0), V0_exact):
+  print(f'K {K_} V0 {V0_:.4e} (exact {V0_exact_:.4e})')
 plt.plot(S0s, V0, c='red')
 plt.xlim(S0s[0], S0s[-1])
 plt.xlabel('$S_0$')